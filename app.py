@@ -2,16 +2,19 @@ import streamlit as st
 import pandas as pd
 import io
 import os
+import hashlib
 import sys
-import tempfile
 import base64
 from datetime import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
-import openpyxl  # Import openpyxl for accurate row detection
 
 # Import the shopify_feed_generator module
 from shopify_feed_generator import generate_shopify_feed, __version__, CONFIG
+from product_index import ProductIndex
+from finish_catalog import FinishCatalog
+from feed_writer import FeedWriter
+from workbook_loader import get_sheet_max_row, get_sheet_names, load_workbook_sheets, REQUIRED_SHEETS, FIRST_DATA_ROW, CACHE_CONFIG
 
 # Set a nice color palette for charts
 plt.style.use('ggplot')
@@ -86,103 +89,99 @@ AVAILABLE_FINISHES = {
 def get_excel_download_link(df, filename):
     """Generate a download link for an Excel file from a DataFrame"""
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False)
+    with FeedWriter(output, df.columns) as writer:
+        writer.write_frame(df)
     
     b64 = base64.b64encode(output.getvalue()).decode()
     href = f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="{filename}">Download {filename}</a>'
     return href
 
-def get_excel_preview(excel_file):
-    """Get a preview of sheets in the Excel file"""
+def get_uploaded_workbook(excel_bytes):
+    """Read an uploaded workbook once, reusing what was read on every rerun for the same upload.
+
+    Returns a dict holding the sheet names and, when the required sheets are all there, the
+    MASTER COPY row count, the parsed sheets, the product index and the finish catalog.
+    """
+    upload_hash = hashlib.sha256(excel_bytes).hexdigest()
+    workbook = st.session_state.get('uploaded_workbook')
+    if workbook is not None and workbook['hash'] == upload_hash:
+        return workbook
+    
+    # Sheet names come from the workbook index, so no sheet is parsed just to list them
+    workbook = {'hash': upload_hash, 'sheets': get_sheet_names(excel_bytes)}
+    
+    if all(sheet in workbook['sheets'] for sheet in REQUIRED_SHEETS):
+        # Uploads are cached on disk by content hash like workbook files, so a new session
+        # given the same workbook reads the row count and sheets from the cache
+        use_cache = CACHE_CONFIG["enabled"]
+        
+        # Use the sheet's declared dimension for an accurate row count (read without parsing any cells)
+        workbook['max_row'] = get_sheet_max_row(excel_bytes, 'MASTER COPY', use_cache=use_cache)
+        
+        # Parse every sheet the generator needs once; generation reuses this parse
+        sheets_data, _ = load_workbook_sheets(excel_bytes, sheet_names=REQUIRED_SHEETS, use_cache=use_cache)
+        workbook['sheets_data'] = sheets_data
+        
+        # Compile the Finishes sheet once for every feed generated from this upload
+        workbook['finish_catalog'] = FinishCatalog(sheets_data['Finishes'])
+        
+        # Group the products once, so every row range is answered from the index
+        # Empty rows are left out, as the generator skips them in test mode
+        df = sheets_data['MASTER COPY']
+        if 'description' in df.columns:
+            workbook['product_index'] = ProductIndex(df[~df.isnull().all(axis=1)])
+    
+    # Only the latest upload is kept, so memory does not grow as files are swapped
+    st.session_state.uploaded_workbook = workbook
+    return workbook
+
+def get_excel_preview(excel_bytes):
+    """Get a preview of sheets in the uploaded Excel file's bytes"""
     try:
-        xls = pd.ExcelFile(excel_file)
-        sheets = xls.sheet_names
+        workbook = get_uploaded_workbook(excel_bytes)
+        sheets = workbook['sheets']
         
         st.write("### Excel File Structure")
         st.write(f"Found {len(sheets)} sheets: {', '.join(sheets)}")
         
         # Check for required sheets
-        required_sheets = ['MASTER COPY', 'Sample', 'Finishes']
-        missing_sheets = [sheet for sheet in required_sheets if sheet not in sheets]
+        missing_sheets = [sheet for sheet in REQUIRED_SHEETS if sheet not in sheets]
         
         if missing_sheets:
             st.error(f"⚠️ Missing required sheets: {', '.join(missing_sheets)}")
             return None
         
-        # Use openpyxl to get accurate row count
-        wb = openpyxl.load_workbook(excel_file, read_only=True)
-        sheet = wb['MASTER COPY']
-        max_row = sheet.max_row
-        wb.close()
-        
-        # Read the MASTER COPY sheet with pandas
-        df = pd.read_excel(excel_file, sheet_name='MASTER COPY')
+        max_row = workbook['max_row']
+        sheets_data = workbook['sheets_data']
         
         # Add a note about the row count
         st.write(f"📊 Excel file contains {max_row} rows in MASTER COPY sheet")
         
-        # Check if there are any rows with descriptions
-        has_descriptions = not df['description'].dropna().empty if 'description' in df.columns else False
+        # Check if there are any rows with descriptions (each one starts a product)
+        product_index = workbook.get('product_index')
+        has_descriptions = product_index is not None and len(product_index) > 0
         
         if not has_descriptions:
             st.error("⚠️ No product descriptions found in the MASTER COPY sheet")
             return None
         
         return {
-            'df': df,
-            'max_row': max_row,  # Use openpyxl's accurate max_row
+            'product_index': product_index,  # Cached with the upload, so row ranges are looked up instantly
+            'max_row': max_row,  # Accurate max_row from the sheet dimension
             'sheets': sheets,
+            'sheets_data': sheets_data,  # Parsed sheets, passed straight to the generator
+            'finish_catalog': workbook['finish_catalog'],
             'has_descriptions': has_descriptions
         }
     except Exception as e:
         st.error(f"Error reading Excel file: {e}")
         return None
 
-def analyze_products(df, start_row, end_row):
-    """Analyze products in the specified row range"""
-    # Make a copy of the dataframe and adjust indexing to match Excel row numbers
-    df = df.copy()
-    
-    # Filter the dataframe to get rows we're interested in
-    # Pandas is 0-indexed, but Excel is 1-indexed
-    # We need to convert between the two and apply a +1 offset to match the generator's row numbering
-    
-    # Convert dataframe index to match Excel row numbers with +1 offset
-    excel_rows = {}
-    for i, (idx, row) in enumerate(df.iterrows()):
-        # Excel row number is pandas index + 1, and we need to add 1 more to match the generator
-        excel_row_num = idx + 2  # Add 2 instead of 1 to fix the off-by-one issue
-        excel_rows[excel_row_num] = row
-    
-    # Now group by description for rows in our range
+def analyze_products(product_index, start_row, end_row):
+    """Analyze products in the specified Excel row range, mapping each description to its row numbers"""
     product_groups = {}
-    current_description = None
-    
-    # Process each row in our selected range
-    for row_num in range(start_row, end_row + 1):
-        # Skip if row doesn't exist in our dataframe
-        if row_num not in excel_rows:
-            continue
-            
-        row = excel_rows[row_num]
-        description = row.get('description')
-        
-        # If this row has a description
-        if not pd.isna(description) and isinstance(description, str) and len(description) > 0:
-            current_description = description
-            if description not in product_groups:
-                product_groups[description] = []
-            product_groups[description].append(row_num)
-        
-        # Row without description but with data and following a known product
-        elif current_description and (
-            not pd.isna(row.get('size')) or 
-            not pd.isna(row.get('code')) or 
-            not pd.isna(row.get('rrp'))
-        ):
-            product_groups[current_description].append(row_num)
-    
+    for description, rows in product_index.rows_in_range(start_row, end_row):
+        product_groups.setdefault(description, []).extend(rows)
     return product_groups
 
 def plot_product_distribution(products):
@@ -243,6 +242,43 @@ def get_excel_file_path():
     else:
         return None
 
+def get_manual_reference():
+    """Load the Sample and Finishes sheets manual feeds are built from, once per session.
+
+    Returns a dict holding the sheets and the finish catalog compiled from the Finishes sheet,
+    which both the finish code picker and the generator use.
+    """
+    excel_file = get_excel_file_path()
+    reference = st.session_state.get('manual_reference')
+    if reference is not None and reference['path'] == excel_file:
+        return reference
+    
+    # Use the Sample and Finishes sheets from the existing file if available
+    sheets = {}
+    try:
+        if excel_file:
+            reference_sheets, _ = load_workbook_sheets(excel_file, sheet_names=['Sample', 'Finishes'])
+            sheets.update(reference_sheets)
+    except Exception:
+        pass
+    
+    if 'Sample' not in sheets:
+        # Create a minimal sample sheet
+        sample_columns = ['Handle', 'Title', 'Option1 Name', 'Option1 Value', 'Option2 Name', 'Option2 Value', 'Variant SKU', 'Variant Price']
+        sheets['Sample'] = pd.DataFrame(columns=sample_columns)
+    
+    if 'Finishes' not in sheets:
+        # Create a minimal finishes sheet
+        finishes_data = {
+            8: list(AVAILABLE_FINISHES.values())[:8],
+            25: list(AVAILABLE_FINISHES.values())
+        }
+        sheets['Finishes'] = pd.DataFrame(dict([(k, pd.Series(v)) for k, v in finishes_data.items()]))
+    
+    reference = {'path': excel_file, 'sheets': sheets, 'finish_catalog': FinishCatalog(sheets['Finishes'])}
+    st.session_state.manual_reference = reference
+    return reference
+
 def create_manual_shopify_feed(manual_rows_data):
     """Create a Shopify feed from manually entered product data using the same logic as file upload"""
     
@@ -260,63 +296,17 @@ def create_manual_shopify_feed(manual_rows_data):
     
     manual_df = pd.DataFrame(df_data)
     
-    # Create temporary files to mimic the Excel structure needed by the generator
-    with tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False) as tmp_file:
-        # Create a workbook with the required sheets
-        with pd.ExcelWriter(tmp_file.name, engine='openpyxl') as writer:
-            # Create MASTER COPY sheet with our manual data
-            manual_df.to_excel(writer, sheet_name='MASTER COPY', index=False)
-            
-            # Create Sample sheet (copy from existing file if available)
-            try:
-                excel_file = get_excel_file_path()
-                if excel_file:
-                    sample_df = pd.read_excel(excel_file, sheet_name='Sample')
-                    sample_df.to_excel(writer, sheet_name='Sample', index=False)
-                else:
-                    # Create a minimal sample sheet
-                    sample_columns = ['Handle', 'Title', 'Option1 Name', 'Option1 Value', 'Option2 Name', 'Option2 Value', 'Variant SKU', 'Variant Price']
-                    empty_sample = pd.DataFrame(columns=sample_columns)
-                    empty_sample.to_excel(writer, sheet_name='Sample', index=False)
-            except:
-                # Create a minimal sample sheet
-                sample_columns = ['Handle', 'Title', 'Option1 Name', 'Option1 Value', 'Option2 Name', 'Option2 Value', 'Variant SKU', 'Variant Price']
-                empty_sample = pd.DataFrame(columns=sample_columns)
-                empty_sample.to_excel(writer, sheet_name='Sample', index=False)
-            
-            # Create Finishes sheet (copy from existing file if available)
-            try:
-                excel_file = get_excel_file_path()
-                if excel_file:
-                    finishes_df = pd.read_excel(excel_file, sheet_name='Finishes')
-                    finishes_df.to_excel(writer, sheet_name='Finishes', index=False)
-                else:
-                    # Create a minimal finishes sheet
-                    finishes_data = {
-                        '8': list(AVAILABLE_FINISHES.values())[:8],
-                        '25': list(AVAILABLE_FINISHES.values())
-                    }
-                    finishes_df = pd.DataFrame(dict([(k, pd.Series(v)) for k, v in finishes_data.items()]))
-                    finishes_df.to_excel(writer, sheet_name='Finishes', index=False)
-            except:
-                # Create a minimal finishes sheet
-                finishes_data = {
-                    '8': list(AVAILABLE_FINISHES.values())[:8],
-                    '25': list(AVAILABLE_FINISHES.values())
-                }
-                finishes_df = pd.DataFrame(dict([(k, pd.Series(v)) for k, v in finishes_data.items()]))
-                finishes_df.to_excel(writer, sheet_name='Finishes', index=False)
-        
-        # Now use the existing generator logic with test mode
-        CONFIG["test_start_row"] = 1  # Start from first row of our manual data
-        CONFIG["test_end_row"] = len(manual_df)  # End at last row of our manual data
-        
-        try:
-            feed_df, finishes_not_found, products_not_processed = generate_shopify_feed(tmp_file.name, test_mode=True)
-            return feed_df, finishes_not_found, products_not_processed
-        finally:
-            # Clean up the temporary file
-            os.unlink(tmp_file.name)
+    # Hand the generator the sheets it needs directly, without writing a workbook to disk
+    reference = get_manual_reference()
+    sheets = {'MASTER COPY': manual_df, **reference['sheets']}
+    
+    # Now use the existing generator logic with test mode
+    CONFIG["test_start_row"] = FIRST_DATA_ROW  # Start from first row of our manual data
+    CONFIG["test_end_row"] = len(manual_df) + FIRST_DATA_ROW - 1  # End at last row of our manual data
+    
+    feed_df, finishes_not_found, products_not_processed = generate_shopify_feed(sheets, test_mode=True, save_reports=False,
+                                                                                finish_catalog=reference['finish_catalog'])
+    return feed_df, finishes_not_found, products_not_processed
 
 def main():
     st.title("Shopify Feed Generator")
@@ -354,16 +344,13 @@ def main():
         uploaded_file = st.file_uploader("Upload your MASTER COPY.xlsx file", type=["xlsx"])
         
         if uploaded_file is not None:
-            # Save the uploaded file to a temporary location
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                tmp_file_path = tmp_file.name
+            # Work on the uploaded bytes directly instead of saving them to a temporary file
+            excel_bytes = uploaded_file.getvalue()
             
             # Get Excel preview
-            preview_data = get_excel_preview(tmp_file_path)
+            preview_data = get_excel_preview(excel_bytes)
             
             if preview_data:
-                df = preview_data['df']
                 max_row = preview_data['max_row']
                 
                 # Row selection
@@ -377,7 +364,7 @@ def main():
                     end_row = st.number_input("End Row", min_value=start_row, max_value=max_row, value=min(100000, max_row))
                 
                 # Analyze products in the selected range
-                products = analyze_products(df, start_row, end_row)
+                products = analyze_products(preview_data['product_index'], start_row, end_row)
                 
                 if products:
                     st.write(f"### Found {len(products)} Products in Rows {start_row}-{end_row}")
@@ -407,13 +394,14 @@ def main():
                             CONFIG["test_start_row"] = start_row
                             CONFIG["test_end_row"] = end_row
                             
-                            # Create output filename
+                            # Create the download filename
                             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                             output_file = f"shopify_feed_{timestamp}.xlsx"
                             
                             try:
-                                # Run the generator
-                                feed_df, finishes_not_found, products_not_processed = generate_shopify_feed(tmp_file_path, output_file, test_mode=True)
+                                # Run the generator on the sheets parsed for the preview; the feed is offered as a download below
+                                feed_df, finishes_not_found, products_not_processed = generate_shopify_feed(preview_data['sheets_data'], test_mode=True, save_reports=False,
+                                                                                                            finish_catalog=preview_data['finish_catalog'])
                                 
                                 if not feed_df.empty:
                                     st.success(f"✅ Successfully generated Shopify feed with {len(feed_df)} rows!")
@@ -484,9 +472,6 @@ def main():
                                 st.error(f"❌ Error generating Shopify feed: {e}")
                 else:
                     st.warning("⚠️ No products found in the selected row range. Please select a different range.")
-            
-            # Clean up the temporary file
-            os.unlink(tmp_file_path)
     
     with tab2:
         st.header("Manual Product Input Method")
@@ -554,7 +539,7 @@ def main():
                     )
                 
                 with col3:
-                    finish_options = ['', '##', 'x##'] + list(AVAILABLE_FINISHES.keys())
+                    finish_options = ['', '##', 'x##'] + list(get_manual_reference()['finish_catalog'].code_to_name)
                     current_finish = row['finish_code'] if row['finish_code'] in finish_options else ''
                     row['finish_code'] = st.selectbox(
                         "Finish Code", 
@@ -0,0 +1,89 @@
+"""
+Incremental Excel writer for the Shopify Feed Generator
+Appends feed rows to a write-only workbook as each product is processed,
+so the finished feed never has to be held in memory. Every feed the
+generator or the web app saves goes through it.
+"""
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+import pandas as pd
+
+# Shopify's TRUE/FALSE columns, which are always saved as text cells
+BOOLEAN_COLUMNS = ('Published', 'Gift Card', 'Variant Requires Shipping', 'Variant Taxable')
+BOOLEAN_COLUMN_PREFIX = 'Included /'
+
+def is_boolean_column(col):
+    """Return whether a feed column holds TRUE/FALSE values"""
+    return col in BOOLEAN_COLUMNS or str(col).startswith(BOOLEAN_COLUMN_PREFIX)
+
+class FeedWriter:
+    """Write Shopify feed rows to an xlsx file a product at a time.
+
+    Rows are streamed to disk as they are appended (strings are written inline, with no shared
+    string table), so memory use does not grow with the feed. Cells in text_columns, by default
+    the TRUE/FALSE columns, are always written as text, with True and False as "TRUE" and "FALSE".
+    output_file may be a path or a binary file-like object.
+    """
+
+    def __init__(self, output_file, columns, text_columns=None):
+        self.output_file = output_file
+        self.columns = list(columns)
+        self.rows_written = 0
+        if text_columns is None:
+            text_columns = [col for col in self.columns if is_boolean_column(col)]
+        text_columns = set(text_columns)
+        self._text_positions = [position for position, col in enumerate(self.columns) if col in text_columns]
+        # Write-only workbooks keep appended rows in a temporary file instead of in memory
+        self._workbook = openpyxl.Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet('Sheet1')
+        self._sheet.append(self.columns)
+
+    def write_rows(self, rows):
+        """Append feed rows (dicts keyed by column name) to the sheet"""
+        for row in rows:
+            self._append([cell_value(row.get(col)) for col in self.columns])
+
+    def write_frame(self, df):
+        """Append the rows of a DataFrame whose columns are the writer's columns"""
+        for values in df.itertuples(index=False, name=None):
+            self._append([cell_value(value) for value in values])
+
+    def _append(self, values):
+        """Append one row of cell values, forcing the text columns to text cells"""
+        for position in self._text_positions:
+            if values[position] is not None:
+                values[position] = self._text_cell(values[position])
+        self._sheet.append(values)
+        self.rows_written += 1
+
+    def _text_cell(self, value):
+        """Return a cell that holds value as text, whatever it looks like"""
+        if isinstance(value, bool):
+            value = "TRUE" if value else "FALSE"
+        cell = WriteOnlyCell(self._sheet, str(value))
+        # Text starting with '=' would otherwise be written as a formula
+        cell.data_type = 's'
+        return cell
+
+    def close(self):
+        """Save the workbook to output_file"""
+        self._workbook.save(self.output_file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._workbook.close()
+        return False
+
+def cell_value(value):
+    """Convert a feed value to what openpyxl can store, leaving missing values empty as to_excel does"""
+    # Any missing scalar (None, NaN, pd.NA, pd.NaT, numpy NaT) is an empty cell
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if hasattr(value, 'item'):
+        return cell_value(value.item())
+    return value
@@ -0,0 +1,259 @@
+"""
+Finish catalog for the Shopify Feed Generator
+Compiles the Finishes sheet once into read-only lookups, so products are matched to their
+finishes without rescanning the sheet, and the generator and the web app share one catalog.
+"""
+from types import MappingProxyType
+import pandas as pd
+from product_classifier import CLASSIFIER_CONFIG
+
+# Finish codes covered by the ## and x## finish codes in MASTER COPY
+HASH_CODES = ("PN", "SN", "BZ", "AB", "SB", "DB", "BAB", "BZW", "BABW", "ABW", "DBW", "NBW", "SBW", "PBUL")
+XHASH_CODES = ("PCOP", "SCOP", "BLN", "PEW", "MBL", "ASV", "RGP", "ACOP")
+
+# Column holding every finish, used when a row's finish code is not recognised
+DEFAULT_FINISH_COLUMN = 25
+
+def parse_finish_code(finish):
+    """Return the code in brackets at the end of a finish name, e.g. 'SB' for 'Satin Brass (SB)', or None"""
+    if isinstance(finish, str) and "(" in finish and ")" in finish:
+        return finish.split("(")[1].split(")")[0].strip()
+    return None
+
+def _column_named(keyword, headers):
+    """Return the first column whose header contains keyword, from (column, lower-cased header) pairs, or None"""
+    keyword = keyword.lower()
+    return next((col for col, header in headers if keyword in header), None)
+
+def _header_count(col, separators=' '):
+    """Return the finish count a Finishes column header names ('14', 14 or '14 Brass'), or None
+
+    The count is the header up to the first of the separators, so passing ' (' also reads '14(Brass)'.
+    """
+    count = str(col)
+    for separator in separators:
+        count = count.split(separator, 1)[0]
+    try:
+        # Only plain digits count, so '14' matches but '014' or '14.0' do not
+        return int(count) if str(int(count)) == count else None
+    except ValueError:
+        return None
+
+class FinishCatalog:
+    """Read-only lookups over a Finishes sheet, built once per sheet.
+
+    code_to_name maps each finish code to its full name (the last one wins if a code is listed
+    more than once) and name_to_code the other way round. finishes_by_keyword and
+    finishes_by_count give the first Finishes column whose header contains a keyword or starts
+    with a finish count. hash_finishes, xhash_finishes and default_finishes are the finishes the
+    ## and x## codes and an unrecognised code apply to. Finish lists are tuples.
+
+    category_by_name is the reverse index used when matching variants to rows: it maps each
+    ## finish name to '##' and each x## finish name to 'X##' (the category rows are matched
+    on), so categorising a finish is one lookup.
+
+    column_info holds what finishes_for_product needs to know about each column: its number of
+    finishes ('non_null'), whether it lists finish codes in brackets ('has_codes'), whether
+    its header is a number ('numeric_header') and whether the header names a keyword
+    ('keyword_column').
+    """
+
+    def __init__(self, finishes_df, keywords=None):
+        if keywords is None:
+            keywords = CLASSIFIER_CONFIG["finish_keywords"]
+        columns = {col: tuple(finishes_df[col].dropna().tolist()) for col in finishes_df.columns}
+        # Headers are lower-cased once, for every keyword lookup
+        headers = {col: str(col).lower() for col in columns}
+
+        code_to_name = {}
+        for finishes in columns.values():
+            for finish in finishes:
+                code = parse_finish_code(finish)
+                if code is not None:
+                    code_to_name[code] = finish
+
+        # The first column named after each finish count; finishes_for_product also reads '14(...)'
+        finishes_by_count = {}
+        product_count_columns = {}
+        for col, finishes in columns.items():
+            count = _header_count(col)
+            if count is not None:
+                finishes_by_count.setdefault(count, finishes)
+            count = _header_count(col, ' (')
+            if count is not None:
+                product_count_columns.setdefault(count, col)
+
+        column_info = {}
+        for col, finishes in columns.items():
+            column_info[col] = MappingProxyType({
+                "non_null": len(finishes),
+                "has_codes": any("(" in str(finish) and ")" in str(finish) for finish in finishes),
+                "numeric_header": str(col).isdigit(),
+                "keyword_column": any(keyword.lower() in headers[col] for keyword in keywords),
+            })
+
+        # The first column whose header contains each keyword, or None; only keyword columns are searched
+        keyword_headers = [(col, header) for col, header in headers.items() if column_info[col]["keyword_column"]]
+        keyword_columns = {keyword: _column_named(keyword, keyword_headers) for keyword in keywords}
+        finishes_by_keyword = {keyword: columns[col] for keyword, col in keyword_columns.items() if col is not None}
+
+        self.finishes_df = finishes_df
+        self.keywords = tuple(keywords)
+        self.code_to_name = MappingProxyType(code_to_name)
+        self.name_to_code = MappingProxyType({name: code for code, name in code_to_name.items()})
+        self.finishes_by_keyword = MappingProxyType(finishes_by_keyword)
+        self.finishes_by_count = MappingProxyType(finishes_by_count)
+        self.column_info = MappingProxyType(column_info)
+        self.hash_finishes = tuple(code_to_name[code] for code in HASH_CODES if code in code_to_name)
+        self.xhash_finishes = tuple(code_to_name[code] for code in XHASH_CODES if code in code_to_name)
+
+        # A name listed under both codes sets counts as ##, which is checked first
+        category_by_name = {name: "X##" for name in self.xhash_finishes}
+        category_by_name.update({name: "##" for name in self.hash_finishes})
+        self.category_by_name = MappingProxyType(category_by_name)
+
+        # The header is text in some workbooks, so '25' is accepted as well as 25
+        self._default_finishes = columns.get(DEFAULT_FINISH_COLUMN, columns.get(str(DEFAULT_FINISH_COLUMN)))
+
+        # Give each finish its own bit, numbering column 25 first
+        finish_names = list(self._default_finishes or ())
+        for finishes in columns.values():
+            finish_names.extend(finishes)
+        self.finish_names = tuple(dict.fromkeys(finish_names))
+        self.finish_bits = MappingProxyType({name: 1 << number for number, name in enumerate(self.finish_names)})
+
+        # Finish resolutions already worked out, keyed by what they were resolved from
+        self._resolved_finishes = {}
+        self._product_finishes = {}
+        self._columns = columns
+        self._headers = tuple(headers.items())
+        self._keyword_columns = keyword_columns
+        self._product_count_columns = product_count_columns
+        self._fallback_column = None
+
+    @property
+    def default_finishes(self):
+        """Every finish, from column 25 of the Finishes sheet"""
+        if self._default_finishes is None:
+            raise KeyError(f"Finishes sheet has no column {DEFAULT_FINISH_COLUMN}")
+        return self._default_finishes
+
+    def resolve_finishes(self, keyword, finish_count, finish_code):
+        """Work out which finishes a MASTER COPY row applies to, returning (source, finishes, mask).
+
+        keyword is the product's finish keyword and finish_count the product's finish count
+        (None when neither applies). The product's keyword column comes first, then its finish
+        count column, then the row's finish code; source says which one was used: 'keyword',
+        'count', '##', 'x##', 'code' or 'default' (column 25, for an unrecognised code).
+        Results are memoised, so products sharing a finish profile are resolved once.
+        """
+        key = (keyword, finish_count, finish_code)
+        resolved = self._resolved_finishes.get(key)
+        if resolved is not None:
+            return resolved
+
+        if self.finishes_by_keyword.get(keyword):
+            source, finishes = 'keyword', self.finishes_by_keyword[keyword]
+        elif self.finishes_by_count.get(finish_count):
+            source, finishes = 'count', self.finishes_by_count[finish_count]
+        elif finish_code == "##":
+            source, finishes = '##', self.hash_finishes
+        elif finish_code == "x##":
+            source, finishes = 'x##', self.xhash_finishes
+        elif finish_code in self.code_to_name:
+            source, finishes = 'code', (self.code_to_name[finish_code],)
+        else:
+            source, finishes = 'default', self.default_finishes
+
+        resolved = self._resolved_finishes[key] = (source, finishes, self.finish_mask(finishes))
+        return resolved
+
+    def finishes_for_product(self, keyword, finish_count):
+        """Return the finishes get_finishes_for_product picks for a product's finish keyword and finish count.
+
+        The keyword's column comes first, then a column named after the finish count, then the
+        first column (preferring column F) listing finish codes in brackets, then the first
+        numbered column. Results are memoised on the keyword and count.
+        """
+        count = None
+        if not pd.isna(finish_count):
+            try:
+                count = int(finish_count)
+            except (ValueError, TypeError):
+                pass
+        key = (keyword, count)
+        finishes = self._product_finishes.get(key)
+        if finishes is None:
+            finishes = self._product_finishes[key] = self._columns[self._product_finish_column(keyword, count)]
+        return finishes
+
+    def _product_finish_column(self, keyword, count):
+        """Pick the Finishes column for finishes_for_product"""
+        finish_col = None
+        if keyword:
+            if keyword in self._keyword_columns:
+                finish_col = self._keyword_columns[keyword]
+            else:
+                # Not one of the catalog's keywords, so any header may name it
+                finish_col = _column_named(keyword, self._headers)
+
+        # If no specific finish column found, check if finish count is specified
+        if not finish_col and count is not None:
+            finish_col = self._product_count_columns.get(count)
+
+        # Otherwise the column is the same for every product
+        if not finish_col:
+            if self._fallback_column is None:
+                self._fallback_column = (self._pick_fallback_column(),)
+            finish_col = self._fallback_column[0]
+        return finish_col
+
+    def _pick_fallback_column(self):
+        """Pick the column for products with no keyword or finish count column, from column_info"""
+        finish_col = None
+
+        # First check column F (which would be column 5 in 0-indexed or 6 in 1-indexed) for finish codes
+        for candidate in [5, 6, 'F', 'f']:
+            info = self.column_info.get(candidate)
+            if info is not None and info["non_null"] > 0 and info["has_codes"]:
+                finish_col = candidate
+                break
+
+        # If column F doesn't work, look for another column listing fewer than the full set of finish codes
+        if not finish_col:
+            for col, info in self.column_info.items():
+                if col not in [0, '0', 25, '25'] and 0 < info["non_null"] < 25 and info["has_codes"]:
+                    finish_col = col
+                    break
+
+        # Default to the first numbered column, or the first column
+        if not finish_col:
+            number_cols = [col for col, info in self.column_info.items() if info["numeric_header"]]
+            finish_col = number_cols[0] if number_cols else self.finishes_df.columns[0]
+        return finish_col
+
+    def finish_mask(self, finishes):
+        """Return the bitmask of a list of finish names"""
+        mask = 0
+        for finish in finishes:
+            mask |= self.finish_bits[finish]
+        return mask
+
+    def finishes_in(self, mask):
+        """Return the finish names in a bitmask, in catalog order"""
+        finishes = []
+        while mask:
+            # Take the lowest set bit each time round
+            bit = mask & -mask
+            finishes.append(self.finish_names[bit.bit_length() - 1])
+            mask ^= bit
+        return finishes
+
+    def finishes_for_count(self, finish_count):
+        """Return the finishes for a 'finish count' cell, or None if the value names no Finishes column"""
+        if pd.isna(finish_count):
+            return None
+        try:
+            return self.finishes_by_count.get(int(finish_count))
+        except (ValueError, TypeError):
+            return None
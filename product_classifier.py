@@ -0,0 +1,87 @@
+"""
+Product classifier for the Shopify Feed Generator
+Finds the finish keyword, Shopify product Type and Option1 Name of every product from its
+description, scanning each unique description once for all the configured keywords together.
+"""
+import re
+
+# Keyword data the classifier is built from; every match is case-insensitive
+CLASSIFIER_CONFIG = {
+    # Product name keywords that have their own column in the Finishes sheet, in order of preference
+    "finish_keywords": ['Bjorn', 'Cadiz', 'Denham', 'Wilton', 'Capri', 'Leon', 'Oxon'],
+    # Product Type of descriptions containing any of the terms, checked in order
+    "product_types": [
+        ("Door Handles", ['handle', 'lever', 'knob']),
+        ("Bathroom", ['bathroom', 'shower', 'toilet', 'bath']),
+        ("Tube Fittings", ['tube', 'fitting']),
+    ],
+    "default_product_type": "Miscellaneous",
+    # Option1 Name used instead of "Size" for descriptions containing the phrase, checked in order
+    "option1_names": [
+        ("lever handles on plate", "Option"),
+        ("lever handle on plate", "Option"),
+    ],
+}
+
+class ProductClassifier:
+    """Classifies product descriptions against CLASSIFIER_CONFIG (or a dict of the same shape).
+
+    Every keyword is compiled into one regular expression, so a description is scanned once
+    whatever the number of keywords. Each description is only classified once, and the
+    results are kept for the lifetime of the classifier.
+    """
+
+    def __init__(self, config=None):
+        config = CLASSIFIER_CONFIG if config is None else config
+        self.finish_keywords = list(config["finish_keywords"])
+        self.product_types = [(product_type, [term.lower() for term in terms]) for product_type, terms in config["product_types"]]
+        self.default_product_type = config["default_product_type"]
+        self.option1_names = [(phrase.lower(), option1_name) for phrase, option1_name in config["option1_names"]]
+
+        terms = {keyword.lower() for keyword in self.finish_keywords}
+        terms.update(term for _, type_terms in self.product_types for term in type_terms)
+        terms.update(phrase for phrase, _ in self.option1_names)
+        terms.discard('')
+
+        # The lookahead finds the longest term starting at every position, longest first; any
+        # shorter term starting there is a prefix of it, so each match stands for its prefixes too
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + "))") if terms else None
+        self._terms_at = {term: {other for other in terms if term.startswith(other)} for term in terms}
+        self._classes = {}
+        self._classes_by_terms = {}
+
+    def classify_all(self, descriptions):
+        """Classify descriptions, returning {description: classification} for every one of them.
+
+        A classification is a dict with the description's "finish_keyword" (or None),
+        "product_type" and "option1_name" (None unless a phrase overrides "Size").
+        """
+        descriptions = list(dict.fromkeys(descriptions))
+        for description in descriptions:
+            if description in self._classes:
+                continue
+            # Descriptions that contain the same terms share one classification
+            found = frozenset(self._pattern.findall(str(description).lower())) if self._pattern is not None else frozenset()
+            classification = self._classes_by_terms.get(found)
+            if classification is None:
+                terms = set()
+                for term in found:
+                    terms.update(self._terms_at[term])
+                classification = self._classes_by_terms[found] = self._classify_terms(terms)
+            self._classes[description] = classification
+        return {description: self._classes[description] for description in descriptions}
+
+    def classify(self, description):
+        """Classify a single description"""
+        classification = self._classes.get(description)
+        if classification is None:
+            classification = self.classify_all([description])[description]
+        return classification
+
+    def _classify_terms(self, terms):
+        """Turn the set of terms found in a description into its classification"""
+        finish_keyword = next((keyword for keyword in self.finish_keywords if keyword.lower() in terms), None)
+        product_type = next((product_type for product_type, type_terms in self.product_types
+                             if any(term in terms for term in type_terms)), self.default_product_type)
+        option1_name = next((option1_name for phrase, option1_name in self.option1_names if phrase in terms), None)
+        return {"finish_keyword": finish_keyword, "product_type": product_type, "option1_name": option1_name}
@@ -0,0 +1,121 @@
+"""
+Product-boundary index for the Shopify Feed Generator
+Finds where each product in MASTER COPY starts and ends once per sheet, so the CLI, test
+mode and the web app group rows the same way and number them by their Excel row.
+"""
+import bisect
+import numpy as np
+import pandas as pd
+from workbook_loader import FIRST_DATA_ROW
+
+def find_product_groups(master_copy_df):
+    """Find the products in a MASTER COPY frame, returning a (description, start, stop) tuple for each.
+
+    A product starts at a row whose description differs from the description above it and runs
+    on through the rows below with the same or no description. start and stop are positions into
+    the frame, so master_copy_df.iloc[start:stop] holds the product's rows; rows above the first
+    description belong to no product.
+    """
+    if master_copy_df.empty:
+        return []
+    descriptions = master_copy_df['description']
+
+    # Forward-fill so each row knows the description of the product it falls under
+    previous_description = descriptions.ffill().shift()
+
+    # A new product starts wherever a row has a description the row above does not fall under
+    is_start = descriptions.notna() & (previous_description.isna() | (descriptions != previous_description))
+    starts = np.flatnonzero(is_start.to_numpy())
+    stops = np.append(starts[1:], len(master_copy_df))
+    return list(zip(descriptions.to_numpy()[starts], starts.tolist(), stops.tolist()))
+
+def iter_product_groups(chunks):
+    """Group consecutive MASTER COPY chunks into products, yielding (description, rows) as each product ends.
+
+    rows is the product's slice of the frame. A product still open at the end of a chunk is
+    carried into the next one, so products can be grouped while the sheet is still being read.
+    """
+    pending_rows = None
+    for chunk in chunks:
+        if pending_rows is not None:
+            chunk = pd.concat([pending_rows, chunk])
+        product_groups = find_product_groups(chunk)
+        if not product_groups:
+            continue
+        for description, start, stop in product_groups[:-1]:
+            yield description, chunk.iloc[start:stop]
+        # The last product may continue in the next chunk
+        pending_description, start, _ = product_groups[-1]
+        pending_rows = chunk.iloc[start:]
+
+    # Yield the last product if there is one
+    if pending_rows is not None:
+        yield pending_description, pending_rows
+
+class ProductIndex:
+    """Where each product of a MASTER COPY frame starts and ends, by Excel row number.
+
+    row_offset is added to the frame's index to get Excel row numbers. The default suits a
+    full parse of the sheet, indexed from 0; frames from read_sheet_window are already
+    indexed by Excel row, so they use 0. The frame may have rows missing (for example
+    products already in the feed), as long as the rows left are in sheet order.
+    """
+
+    def __init__(self, master_copy_df, row_offset=FIRST_DATA_ROW):
+        self.master_copy_df = master_copy_df
+        self.row_offset = row_offset
+        product_groups = find_product_groups(master_copy_df)
+        self.descriptions = [description for description, _, _ in product_groups]
+        self.starts = [start for _, start, _ in product_groups]
+        self.stops = [stop for _, _, stop in product_groups]
+
+        # Excel row numbers of every row, of the rows with a description and of the first
+        # row of every product, for binary search
+        self.row_numbers = (np.asarray(master_copy_df.index) + row_offset).tolist()
+        described = np.flatnonzero(master_copy_df['description'].notna().to_numpy()) if len(master_copy_df) else []
+        self.described_rows = [self.row_numbers[position] for position in described]
+        self.start_rows = [self.row_numbers[start] for start in self.starts]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def products(self):
+        """Yield (description, rows) for every product, slicing each product's rows only when it is reached"""
+        for product_num in range(len(self)):
+            yield self.descriptions[product_num], self.master_copy_df.iloc[self.starts[product_num]:self.stops[product_num]]
+
+    def _ranges_in_range(self, start_row, end_row):
+        """Yield (product number, start, stop) positions of the products found in Excel rows start_row..end_row"""
+        first_product = bisect.bisect_left(self.start_rows, start_row)
+        last_product = bisect.bisect_right(self.start_rows, end_row)
+        # Positions of the first row in the range and just past the last one
+        range_start = bisect.bisect_left(self.row_numbers, start_row)
+        range_stop = bisect.bisect_right(self.row_numbers, end_row)
+
+        if first_product > 0 and self.stops[first_product - 1] > range_start:
+            # The range opens inside a product; it restarts at the next row with its description
+            product_num = first_product - 1
+            described = bisect.bisect_left(self.described_rows, start_row)
+            if described < len(self.described_rows):
+                restart = bisect.bisect_left(self.row_numbers, self.described_rows[described])
+                stop = min(self.stops[product_num], range_stop)
+                if restart < stop:
+                    yield product_num, restart, stop
+
+        for product_num in range(first_product, last_product):
+            yield product_num, self.starts[product_num], min(self.stops[product_num], range_stop)
+
+    def products_in_range(self, start_row, end_row):
+        """Yield (description, rows) for the products found in Excel rows start_row..end_row.
+
+        Products are found as if only the range had been read: each product's rows stop at
+        end_row, and a product that started above the range is picked up from its first row
+        in the range that repeats the description (rows before that are left out).
+        """
+        for product_num, start, stop in self._ranges_in_range(start_row, end_row):
+            yield self.descriptions[product_num], self.master_copy_df.iloc[start:stop]
+
+    def rows_in_range(self, start_row, end_row):
+        """Yield (description, Excel row numbers) for the products products_in_range() finds, without slicing the frame"""
+        for product_num, start, stop in self._ranges_in_range(start_row, end_row):
+            yield self.descriptions[product_num], self.row_numbers[start:stop]
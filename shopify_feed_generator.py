@@ -3,8 +3,16 @@ import numpy as np
 import re
 import argparse
 from datetime import datetime
+import time
 import warnings
-import openpyxl
+from workbook_loader import (load_workbook_sheets, read_sheet_window, iter_sheet_chunks, get_sheet_max_row,
+                             print_load_times, sku_to_string, CACHE_CONFIG, READER_CONFIG, READER_BACKENDS, COLUMN_K,
+                             FIRST_DATA_ROW, clear_cache)
+from feed_writer import FeedWriter
+from variant_table import VariantTable
+from product_index import ProductIndex, iter_product_groups
+from finish_catalog import FinishCatalog
+from product_classifier import ProductClassifier, CLASSIFIER_CONFIG
 
 # Version information
 __version__ = "1.10.0"
@@ -20,6 +28,58 @@ CONFIG = {
     "test_end_row": 14787     # Default end row
 }
 
+# Where the Shopify columns that are not a variant's own values (Option1/Option2 Value,
+# Variant SKU and Variant Price) come from. "first_row" columns are only set on each
+# product's first row and "variant" columns on every variant row. A "{name}" value is
+# filled in from the product (see fill_feed_fields), and a column that comes out as None
+# is left empty. Columns missing from the Sample template are added in this order.
+FEED_FIELDS = {
+    "first_row": {
+        'Title': "{description}",
+        # Image Alt Text matches the Title
+        'Image Alt Text': "{description}",
+        'Vendor': "vendor-unknown",
+        'Product Category': "Uncategorized",
+        'Type': "{product_type}",
+        # Use string "TRUE" instead of boolean True
+        'Published': "TRUE",
+        'Option1 Name': "{option1_name}",
+        'Option2 Name': "{option2_name}",
+        # An example image from the Sample sheet
+        'Image Src': "{image}",
+        'Image Position': 1,
+        'Gift Card': "FALSE",
+        'SEO Title': "{description} | A&H Brass",
+        # Tags from column K
+        'Tags': "{tags}",
+        'Included / United Kingdom': "TRUE",
+        'Included / Australia': "TRUE",
+        'Included / Canada': "TRUE",
+        'Included / Europe': "TRUE",
+        'Included / International': "TRUE",
+        'Included / United States': "TRUE",
+        'Status': "draft",
+    },
+    # Every variant row, in the order the columns are laid out in the feed. None marks each
+    # variant's own values, which VariantTable fills in; the rest are the same for every variant.
+    "variant": {
+        'Option1 Value': None,
+        'Option2 Value': None,
+        'Variant SKU': None,
+        'Variant Grams': 0,
+        'Variant Inventory Tracker': "shopify",
+        'Variant Inventory Qty': 10000,
+        'Variant Inventory Policy': "deny",
+        'Variant Fulfillment Service': "manual",
+        'Variant Price': None,
+        'Variant Requires Shipping': "TRUE",
+        'Variant Taxable': "TRUE",
+        # The same image for all variants
+        'Variant Image': "{image}",
+        'Variant Weight Unit': "kg",
+    },
+}
+
 def clean_string(s):
     """Clean a string to create a handle (lowercase, replace spaces with hyphens)"""
     if pd.isna(s):
@@ -40,20 +100,31 @@ def clean_option_value(value, option_name):
 def get_tags_from_column_k(product_group):
     """Get tags from column K (11th column, index 10) of the first row in product group"""
     try:
-        # Get the first row of the product group
-        first_row = product_group[0]
+        # Get the first row of the product group's DataFrame
+        first_row = product_group.iloc[0]
         
         # Handle pandas Series (both test and normal mode use Series)
         if hasattr(first_row, 'iloc'):  # This is a pandas Series
-            if len(first_row) > 10:  # Make sure column K exists
+            # Sheets loaded with the MASTER COPY schema keep column K under its own name
+            if COLUMN_K in first_row.index:
+                column_k_value = first_row[COLUMN_K]
+            elif len(first_row) > 10:  # Make sure column K exists
                 column_k_value = first_row.iloc[10]
-                if not pd.isna(column_k_value) and str(column_k_value).strip():
-                    return str(column_k_value).strip()
+            else:
+                return None
+            if not pd.isna(column_k_value) and str(column_k_value).strip():
+                return str(column_k_value).strip()
         
         return None
     except (IndexError, AttributeError, KeyError):
         return None
 
+def get_existing_skus(existing_feed_df=None):
+    """Get the SKUs already in the existing feed, as strings to match the MASTER COPY 'code' column"""
+    if existing_feed_df is None or existing_feed_df.empty:
+        return set()
+    return set(existing_feed_df['Variant SKU'].dropna().map(sku_to_string))
+
 def find_new_products(master_copy_df, existing_feed_df=None):
     """Find new products in the MASTER COPY tab that need to be added to the feed"""
     # If no existing feed is provided, all products are considered new
@@ -61,134 +132,540 @@ def find_new_products(master_copy_df, existing_feed_df=None):
         return master_copy_df
     
     # Get all SKUs in the existing feed
-    existing_skus = set(existing_feed_df['Variant SKU'].dropna().unique())
+    existing_skus = get_existing_skus(existing_feed_df)
     
     # Find rows in master_copy that have SKUs not in the existing feed
     new_product_rows = master_copy_df[~master_copy_df['code'].isin(existing_skus)]
     
     return new_product_rows
 
-def group_products(master_copy_df):
-    """Group products by description to handle multiple sizes of the same product"""
-    product_groups = []
-    current_group = []
-    current_description = None
-    
-    for _, row in master_copy_df.iterrows():
-        # If the row has a description and it's different from the current one, start a new group
-        if not pd.isna(row['description']):
-            if current_description != row['description']:
-                if current_group:
-                    product_groups.append(current_group)
-                current_group = [row]
-                current_description = row['description']
-            else:
-                # Same description, add to current group
-                current_group.append(row)
-        elif current_group:
-            # No description, but might be a continuation of current product
-            current_group.append(row)
-    
-    # Add the last group if it exists
-    if current_group:
-        product_groups.append(current_group)
-    
-    return product_groups
+def _rows_with_value(df, column):
+    """Boolean mask of the rows of df that have a value in column (all False if df has no such column)"""
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df[column].notna().to_numpy()
 
 def get_product_type(description):
     """Determine the product type based on description keywords"""
     description = str(description).lower()
     
-    if any(term in description for term in ['handle', 'lever', 'knob']):
-        return "Door Handles"
-    elif any(term in description for term in ['bathroom', 'shower', 'toilet', 'bath']):
-        return "Bathroom"
-    elif any(term in description for term in ['tube', 'fitting']):
-        return "Tube Fittings"
-    else:
-        return "Miscellaneous"
+    for product_type, terms in CLASSIFIER_CONFIG["product_types"]:
+        if any(term.lower() in description for term in terms):
+            return product_type
+    return CLASSIFIER_CONFIG["default_product_type"]
+
+def get_finishes_for_product(product_description, finish_count, finish_catalog):
+    """Determine which finishes to use for a product
 
-def get_finishes_for_product(product_description, finish_count, finishes_df):
-    """Determine which finishes to use for a product"""
+    finish_catalog is the FinishCatalog built from the Finishes sheet; pass the same catalog
+    for every product so its column metadata and every keyword and finish count already
+    resolved carry over between them. The Finishes DataFrame itself is also accepted, but
+    then a new catalog is built on every call.
+    """
+    if not isinstance(finish_catalog, FinishCatalog):
+        finish_catalog = FinishCatalog(finish_catalog)
+    
     # Check if product name contains keywords to determine which finish column to use
-    keywords = ['Bjorn', 'Cadiz', 'Denham', 'Wilton', 'Capri', 'Leon', 'Oxon']
+    keywords = CLASSIFIER_CONFIG["finish_keywords"]
     matching_keywords = [keyword for keyword in keywords if keyword.lower() in str(product_description).lower()]
+    keyword = matching_keywords[0] if matching_keywords else None
     
-    # Find finish column in Finishes tab
-    finish_col = None
-    
-    if matching_keywords:
-        keyword = matching_keywords[0]
-        for col in finishes_df.columns:
-            if str(col).lower().find(keyword.lower()) != -1:
-                finish_col = col
+    # Get the finishes from the appropriate column
+    return list(finish_catalog.finishes_for_product(keyword, finish_count))
+
+def build_feed_context(finishes_df, sample_df, finish_catalog=None):
+    """Collect the Finishes/Sample data every product group is built from"""
+    sample_image = get_sample_image(sample_df)
+    return {
+        "sample_df": sample_df,
+        # Create a template for the Shopify feed using the columns from Sample tab
+        "template_columns": sample_df.columns.tolist(),
+        # Finish lookups, compiled once from the Finishes sheet unless one is passed in
+        "finish_catalog": finish_catalog if finish_catalog is not None else FinishCatalog(finishes_df),
+        # Finish keyword, Type and Option1 Name of each product, classified once per description
+        "classifier": ProductClassifier(),
+        # The Sample image and the fields every variant row gets, worked out once
+        "sample_image": sample_image,
+        # The columns set on a product's first row; image columns are left out without a Sample image
+        "product_columns": [col for col, value in FEED_FIELDS["first_row"].items() if value != "{image}" or sample_image is not None],
+        "variant_constants": fill_feed_fields(FEED_FIELDS["variant"], {"image": sample_image})
+    }
+
+def get_sample_image(sample_df):
+    """Return the Sample sheet's first Image Src, or None if it has none"""
+    if not sample_df.empty and 'Image Src' in sample_df.columns and not pd.isna(sample_df['Image Src'].iloc[0]):
+        return sample_df['Image Src'].iloc[0]
+    return None
+
+def fill_feed_fields(fields, values):
+    """Fill in a FEED_FIELDS mapping from a dict of values, leaving out columns that come out as None"""
+    filled = {}
+    for col, value in fields.items():
+        if isinstance(value, str) and '{' in value:
+            name = re.fullmatch(r'\{(\w+)\}', value)
+            # A value that is just one placeholder keeps the value's own type
+            value = values.get(name.group(1)) if name else value.format_map(values)
+        if value is not None:
+            filled[col] = value
+    return filled
+
+def build_variant_table(row_data, sizes, finishes, finish_catalog):
+    """Map each (size, finish) variant of a product to the row_data key of the row it takes its SKU and price from.
+
+    A row with the finish's own code comes first, then a row with the finish's ## or X##
+    category code, then the first row whose applicable finishes include it. Rows only match
+    variants of their own size (None for rows without one), and variants no row applies to
+    are left out.
+    """
+    code_to_name = finish_catalog.code_to_name
+    
+    # Index the rows once by each way they can match, keeping the first row for every key
+    exact_rows = {}
+    category_rows = {}
+    applicable_rows = {}
+    covered_masks = {}
+    for idx, data in row_data.items():
+        size = data["size"]
+        finish_code = data["finish_code"]
+        if finish_code in code_to_name:
+            exact_rows.setdefault((size, code_to_name[finish_code]), idx)
+        category_rows.setdefault((size, finish_code), idx)
+        # Only finishes no earlier row of this size applies to are new
+        covered_mask = covered_masks.get(size, 0)
+        for finish in finish_catalog.finishes_in(data["finish_mask"] & ~covered_mask):
+            applicable_rows[(size, finish)] = idx
+        covered_masks[size] = covered_mask | data["finish_mask"]
+    
+    variant_table = {}
+    for size in sizes:
+        for finish in finishes:
+            idx = exact_rows.get((size, finish))
+            if idx is None:
+                category = finish_catalog.category_by_name.get(finish)
+                if category:
+                    idx = category_rows.get((size, category))
+            if idx is None:
+                idx = applicable_rows.get((size, finish))
+            if idx is not None:
+                variant_table[(size, finish)] = idx
+    return variant_table
+
+def add_product_variants(feed_table, handle, product_fields, row_data, unique_sizes, unique_finishes, finish_catalog):
+    """Add a product to feed_table with a variant for each size-finish combination one of its rows applies to"""
+    product_has_sizes = len(unique_sizes) > 0
+    product_id = feed_table.add_product(handle, product_fields, product_has_sizes)
+    
+    # Products without sizes have one variant per finish, and the finish becomes Option1
+    sizes = unique_sizes if product_has_sizes else [None]
+    
+    # Resolve which row every size-finish combination takes its SKU and price from
+    variant_sources = build_variant_table(row_data, sizes, unique_finishes, finish_catalog)
+    
+    for size in sizes:
+        option_size = clean_option_value(size, "Size") if product_has_sizes else None
+        for finish in unique_finishes:
+            # Skip finishes no row of this size applies to
+            idx = variant_sources.get((size, finish))
+            if idx is not None:
+                data = row_data[idx]
+                feed_table.add_variant(product_id, option_size, finish, data["sku"], data["price"])
+
+def process_test_product_group(product_num, product_description, product_group_rows, context, feed_table,
+                               finishes_not_found, products_not_processed):
+    """Add the variants of one product group found in test mode, given as a DataFrame of its rows, to feed_table"""
+    finish_catalog = context['finish_catalog']
+    finish_code_to_name = finish_catalog.code_to_name
+    
+    if pd.isna(product_description):
+        print(f"Skipping product group {product_num+1} with no description")
+        return
+        
+    print(f"\nProcessing product {product_num+1}: {product_description}")
+    
+    # Get tags from column K for this product group
+    tags = get_tags_from_column_k(product_group_rows)
+    if not tags:
+        print(f"Warning: No tags found in column K for product: {product_description}")
+        # Track this product as not processed due to missing tags
+        products_not_processed.append({
+            "Product Description": product_description,
+            "Reason": "Missing tag in column K",
+            "Row Range": f"Rows {product_group_rows.index[0]}-{product_group_rows.index[-1]}" if len(product_group_rows) > 0 else "Unknown"
+        })
+        return
+    else:
+        print(f"Found tags for product: {tags}")
+    
+    # Generate handle from product description
+    handle = clean_string(product_description)
+    
+    # The product's rows are already a slice of MASTER COPY
+    valid_rows_df = product_group_rows
+    
+    # Get all unique sizes from the valid rows
+    unique_sizes = valid_rows_df['size'].dropna().unique()
+    print(f"Unique sizes: {unique_sizes}")
+    print(f"Number of unique sizes: {len(unique_sizes)}")
+    
+    # Check if product name contains keywords for finish selection
+    classification = context['classifier'].classify(product_description)
+    matching_keyword = classification["finish_keyword"]
+            
+    # Find matching finish column based on product name
+    product_specific_finishes = finish_catalog.finishes_by_keyword.get(matching_keyword)
+    if product_specific_finishes is not None:
+        print(f"Found product-specific finishes for '{matching_keyword}': {len(product_specific_finishes)} finishes")
+    
+    # Check if finish count is specified in any row
+    finish_count = None
+    for idx, row in valid_rows_df.iterrows():
+        finish_count_specific_finishes = finish_catalog.finishes_for_count(row.get('finish count'))
+        if finish_count_specific_finishes is not None:
+            print(f"Found finish count {int(row['finish count'])} with {len(finish_count_specific_finishes)} finishes")
+            if finish_count_specific_finishes:
+                finish_count = int(row['finish count'])
                 break
     
-    # If no specific finish column found, check if finish count is specified
-    if not finish_col and not pd.isna(finish_count):
-        try:
-            finish_count = int(finish_count)
-            # Look for exact matches or columns that start with the count followed by a space or parenthesis
-            matching_count_cols = [col for col in finishes_df.columns 
-                                   if (str(col) == str(finish_count) or 
-                                       str(col).startswith(str(finish_count) + ' ') or
-                                       str(col).startswith(str(finish_count) + '('))]
-            if matching_count_cols:
-                finish_col = matching_count_cols[0]
-        except (ValueError, TypeError):
-            pass
+    # Store SKU/price data by row and track which finishes each row applies to
+    row_data = {}
+    for idx, row in valid_rows_df.iterrows():
+        if not pd.isna(row['code']) and not pd.isna(row['rrp']):
+            size = row['size'] if not pd.isna(row.get('size')) else None
+            # 'code' is loaded as a string by the MASTER COPY schema
+            sku = str(row['code'])
+            price = float(row['rrp'])
+            finish_code = row['finish'] if not pd.isna(row['finish']) else None
+            
+            # Determine which finishes this row applies to, resolved once per keyword, finish count and code
+            finish_source, applicable_finishes, finish_mask = finish_catalog.resolve_finishes(matching_keyword, finish_count, finish_code)
+            
+            # First priority: Use product-specific finishes if available
+            if finish_source == 'keyword':
+                print(f"Row {idx}: Using {len(applicable_finishes)} product-specific finishes for '{matching_keyword}'")
+            
+            # Second priority: Use finish count specific finishes if available
+            elif finish_source == 'count':
+                print(f"Row {idx}: Using {len(applicable_finishes)} finishes based on finish count")
+            
+            # Third priority: Use finish code
+            elif finish_source == '##':
+                # This row applies to the 14 ## finishes
+                if size:
+                    print(f"Row {idx}: Size={size}, SKU={sku}, Price=£{price}, Finish=##, Applies to {len(applicable_finishes)} finishes")
+                else:
+                    print(f"Row {idx}: No size, SKU={sku}, Price=£{price}, Finish=##, Applies to {len(applicable_finishes)} finishes")
+            elif finish_source == 'x##':
+                # This row applies to the 8 x## finishes
+                if size:
+                    print(f"Row {idx}: Size={size}, SKU={sku}, Price=£{price}, Finish=x##, Applies to {len(applicable_finishes)} finishes")
+                else:
+                    print(f"Row {idx}: No size, SKU={sku}, Price=£{price}, Finish=x##, Applies to {len(applicable_finishes)} finishes")
+            elif finish_source == 'code':
+                # This row applies to a specific finish
+                if size:
+                    print(f"Row {idx}: Size={size}, SKU={sku}, Price=£{price}, Finish={finish_code}, Applies to {finish_code_to_name[finish_code]}")
+                else:
+                    print(f"Row {idx}: No size, SKU={sku}, Price=£{price}, Finish={finish_code}, Applies to {finish_code_to_name[finish_code]}")
+            else:
+                # If we can't determine the finishes, use all finishes from column 25
+                print(f"Warning: Row {idx} has unknown finish code {finish_code}. Using all finishes.")
+                
+                # Track this product as having unidentified finishes
+                finishes_not_found.append({
+                    "Product Description": product_description,
+                    "Row Index": idx,
+                    "Size": size if size else "No size",
+                    "SKU": sku,
+                    "Finish Code": finish_code,
+                    "Reason": f"Unknown finish code: {finish_code}",
+                    "Defaulted To": f"{len(applicable_finishes)} finishes from column 25"
+                })
+            
+            row_data[idx] = {
+                "size": size,
+                "price": price,
+                "sku": sku,
+                "finish_code": finish_code,
+                "finish_mask": finish_mask,
+                "has_size": size is not None
+            }
+    
+    if not row_data:
+        print(f"Error: No valid SKU/price data found in rows for product: {product_description}")
+        # Track this product as not processed
+        products_not_processed.append({
+            "Product Description": product_description,
+            "Reason": "Missing SKU/price data",
+            "Row Range": f"Rows {product_group_rows.index[0]}-{product_group_rows.index[-1]}" if len(product_group_rows) > 0 else "Unknown"
+        })
+        return
+    
+    print(f"Found {len(row_data)} rows with valid data")
+    
+    # Get all unique finishes that will be used, in the Finishes sheet's order
+    all_finishes_mask = 0
+    for data in row_data.values():
+        all_finishes_mask |= data["finish_mask"]
+    unique_finishes = finish_catalog.finishes_in(all_finishes_mask)
+    print(f"Total unique finishes: {len(unique_finishes)}")
+    
+    # Determine if this product has sizes or not  
+    product_has_sizes = len(unique_sizes) > 0
+    
+    # Calculate expected number of variants
+    if product_has_sizes:
+        expected_variants = len(unique_sizes) * len(unique_finishes)
+        print(f"Expected number of variants: {len(unique_sizes)} sizes × {len(unique_finishes)} finishes = {expected_variants}")
+    else:
+        expected_variants = len(unique_finishes)
+        print(f"Expected number of variants (no sizes): {len(unique_finishes)} finishes = {expected_variants}")
+    
+    # The fields only set on the product's first row
+    if product_has_sizes:
+        option1_name, option2_name = "Size", "Finish"
+    else:
+        # For products without sizes - set Option1 to Finish, leave Option2 empty
+        option1_name, option2_name = "Finish", None
+    product_fields = fill_feed_fields(FEED_FIELDS["first_row"], {
+        "description": product_description,
+        "product_type": classification["product_type"],
+        "option1_name": option1_name,
+        "option2_name": option2_name,
+        "tags": tags,
+        "image": context["sample_image"],
+    })
+    
+    add_product_variants(feed_table, handle, product_fields, row_data, unique_sizes, unique_finishes, finish_catalog)
+
+def process_product_group(product_group, context, feed_table, finishes_not_found, products_not_processed):
+    """Add the variants of one product group in normal mode, given as a DataFrame of its rows, to feed_table"""
+    finish_catalog = context['finish_catalog']
+    finish_code_to_name = finish_catalog.code_to_name
+    
+    # Get product details from the first row
+    first_row = product_group.iloc[0]
+    product_description = first_row['description']
+    
+    # Skip if no description
+    if pd.isna(product_description):
+        return
+    
+    print(f"Processing product: {product_description}")
+    
+    # Get tags from column K for this product group
+    tags = get_tags_from_column_k(product_group)
+    if not tags:
+        print(f"Warning: No tags found in column K for product: {product_description}")
+        # Track this product as not processed due to missing tags
+        products_not_processed.append({
+            "Product Description": product_description,
+            "Reason": "Missing tag in column K",
+            "Row Range": f"Product group with {len(product_group)} rows"
+        })
+        return
+    else:
+        print(f"Found tags for product: {tags}")
+    
+    # Generate handle from product description
+    handle = clean_string(product_description)
+    
+    # Only rows with both a SKU and a price can become variants
+    is_valid = _rows_with_value(product_group, 'code') & _rows_with_value(product_group, 'rrp')
+    has_size = _rows_with_value(product_group, 'size')
     
-    # If still no match, check column F (6th column) and other specific finish code columns
-    if not finish_col:
-        # First check column F (which would be column 5 in 0-indexed or 6 in 1-indexed)
-        # Try different ways column F might be represented
-        f_column_candidates = [5, 6, 'F', 'f']
-        for candidate in f_column_candidates:
-            if candidate in finishes_df.columns:
-                finishes_in_col = finishes_df[candidate].dropna().tolist()
-                if len(finishes_in_col) > 0:
-                    # Check if this column contains finish codes (entries with parentheses)
-                    has_codes = any("(" in str(finish) and ")" in str(finish) for finish in finishes_in_col)
-                    if has_codes:
-                        finish_col = candidate
-                        break
+    # Check if this product has any sizes
+    rows_with_sizes = product_group[is_valid & has_size]
+    rows_without_sizes = product_group[is_valid & ~has_size]
+    
+    has_sizes = len(rows_with_sizes) > 0
+    # Sizes are kept in the order they first appear, so the feed's row order is the same every run
+    unique_sizes = list(dict.fromkeys(rows_with_sizes['size'])) if has_sizes else []
+    
+    print(f"  Found {len(unique_sizes)} unique sizes, {len(rows_without_sizes)} rows without sizes")
+    
+    # Use all valid rows (both with and without sizes) for processing
+    valid_rows = [row for _, row in rows_with_sizes.iterrows()] + [row for _, row in rows_without_sizes.iterrows()]
+    
+    # Check if product name contains keywords for finish selection
+    classification = context['classifier'].classify(product_description)
+    matching_keyword = classification["finish_keyword"]
+            
+    # Find matching finish column based on product name
+    product_specific_finishes = finish_catalog.finishes_by_keyword.get(matching_keyword)
+    if product_specific_finishes is not None:
+        print(f"  Found product-specific finishes for '{matching_keyword}': {len(product_specific_finishes)} finishes")
+    
+    # Check if finish count is specified in any row
+    finish_count = None
+    for i, row in enumerate(valid_rows):
+        finish_count_specific_finishes = finish_catalog.finishes_for_count(row.get('finish count'))
+        if finish_count_specific_finishes is not None:
+            print(f"  Found finish count {int(row['finish count'])} with {len(finish_count_specific_finishes)} finishes")
+            if finish_count_specific_finishes:
+                finish_count = int(row['finish count'])
+                break
+    
+    # Store data by row and track which finishes each row applies to
+    row_data = {}
+    for i, row in enumerate(valid_rows):
+        if pd.isna(row.get('code')) or pd.isna(row.get('rrp')):
+            continue
+            
+        size = row['size'] if not pd.isna(row.get('size')) else None
+        # 'code' is loaded as a string by the MASTER COPY schema
+        sku = str(row['code'])
+        price = float(row['rrp'])
+        finish_code = row['finish'] if not pd.isna(row['finish']) else None
+        
+        # Determine which finishes this row applies to, resolved once per keyword, finish count and code
+        finish_source, applicable_finishes, finish_mask = finish_catalog.resolve_finishes(matching_keyword, finish_count, finish_code)
+        
+        # First priority: Use product-specific finishes if available
+        if finish_source == 'keyword':
+            print(f"  Row {i}: Using {len(applicable_finishes)} product-specific finishes for '{matching_keyword}'")
         
-        # If column F doesn't work, look for other columns with specific finish codes
-        if not finish_col:
-            for col in finishes_df.columns:
-                if col not in [0, '0', 25, '25']:  # Skip first and last default columns
-                    finishes_in_col = finishes_df[col].dropna().tolist()
-                    # Look for columns with a specific number of finishes that might be relevant
-                    if len(finishes_in_col) > 0 and len(finishes_in_col) < 25:  # Less than the full set
-                        # Check if this column contains finish codes (entries with parentheses)
-                        has_codes = any("(" in str(finish) and ")" in str(finish) for finish in finishes_in_col)
-                        if has_codes:
-                            finish_col = col
-                            break
-    
-    # Default to the first column if no match found
-    if not finish_col:
-        # Look for columns that are purely numbers (finish counts)
-        number_cols = [col for col in finishes_df.columns if str(col).isdigit()]
-        if number_cols:
-            finish_col = number_cols[0]
+        # Second priority: Use finish count specific finishes if available
+        elif finish_source == 'count':
+            print(f"  Row {i}: Using {len(applicable_finishes)} finishes based on finish count")
+        
+        # Third priority: Use finish code
+        elif finish_source == '##':
+            # This row applies to the 14 ## finishes
+            print(f"  Row {i}: Size={size}, SKU={sku}, Price=£{price}, Finish=##, Applies to {len(applicable_finishes)} finishes")
+        elif finish_source == 'x##':
+            # This row applies to the 8 x## finishes
+            print(f"  Row {i}: Size={size}, SKU={sku}, Price=£{price}, Finish=x##, Applies to {len(applicable_finishes)} finishes")
+        elif finish_source == 'code':
+            # This row applies to a specific finish
+            print(f"  Row {i}: Size={size}, SKU={sku}, Price=£{price}, Finish={finish_code}, Applies to {finish_code_to_name[finish_code]}")
         else:
-            finish_col = finishes_df.columns[0]
-    
-    # Get the finishes from the appropriate column
-    finishes = finishes_df[finish_col].dropna().tolist()
-    return finishes
+            # If we can't determine the finishes, use all finishes from column 25
+            print(f"  Warning: Row {i} has unknown finish code {finish_code}. Using all finishes.")
+            
+            # Track this product as having unidentified finishes
+            finishes_not_found.append({
+                "Product Description": product_description,
+                "Row Index": f"Row {i}",
+                "Size": size,
+                "SKU": sku,
+                "Finish Code": finish_code,
+                "Reason": f"Unknown finish code: {finish_code}",
+                "Defaulted To": f"{len(applicable_finishes)} finishes from column 25"
+            })
+        
+        row_data[i] = {
+            "size": size,
+            "price": price,
+            "sku": sku,
+            "finish_code": finish_code,
+            "finish_mask": finish_mask,
+            "row": row,  # Keep original row data for reference
+            "has_size": size is not None
+        }
+    
+    if not row_data:
+        print(f"Error: No valid SKU/price data found in rows for product: {product_description}")
+        # Track this product as not processed
+        products_not_processed.append({
+            "Product Description": product_description,
+            "Reason": "Missing SKU/price data",
+            "Row Range": f"Product group with {len(product_group)} rows"
+        })
+        return
+    
+    # Get all unique finishes that will be used, in the Finishes sheet's order
+    all_finishes_mask = 0
+    for data in row_data.values():
+        all_finishes_mask |= data["finish_mask"]
+    unique_finishes = finish_catalog.finishes_in(all_finishes_mask)
+    
+    # Determine if this product has sizes or not
+    product_has_sizes = len(unique_sizes) > 0
+    
+    # Calculate expected number of variants
+    if product_has_sizes:
+        expected_variants = len(unique_sizes) * len(unique_finishes)
+        print(f"  Expected variants: {len(unique_sizes)} sizes × {len(unique_finishes)} finishes = {expected_variants}")
+    else:
+        expected_variants = len(unique_finishes)
+        print(f"  Expected variants (no sizes): {len(unique_finishes)} finishes = {expected_variants}")
+    
+    # The fields only set on the product's first row
+    if product_has_sizes:
+        # For products with sizes - set Option1 to Size, Option2 to Finish
+        # Lever handles on plate are named "Option" rather than "Size"
+        option1_name, option2_name = classification["option1_name"] or "Size", "Finish"
+    else:
+        # For products without sizes - set Option1 to Finish, leave Option2 empty
+        option1_name, option2_name = "Finish", None
+    product_fields = fill_feed_fields(FEED_FIELDS["first_row"], {
+        "description": product_description,
+        "product_type": classification["product_type"],
+        "option1_name": option1_name,
+        "option2_name": option2_name,
+        "tags": tags,
+        "image": context["sample_image"],
+    })
+    
+    add_product_variants(feed_table, handle, product_fields, row_data, unique_sizes, unique_finishes, finish_catalog)
+
+def iter_new_product_chunks(excel_file, existing_feed_df=None):
+    """Yield the rows of new MASTER COPY products as DataFrames, reading the sheet a chunk at a time"""
+    existing_skus = get_existing_skus(existing_feed_df)
+    for chunk in iter_sheet_chunks(excel_file, 'MASTER COPY'):
+        if existing_skus:
+            chunk = chunk[~chunk['code'].isin(existing_skus)]
+        yield chunk
+
+def generate_shopify_feed(excel_file, output_file=None, test_mode=False, stream=False, save_reports=True,
+                          finish_catalog=None):
+    """Generate a Shopify product feed from MASTER COPY tab for new products
+
+    Returns (feed, finishes_not_found, products_not_processed), where feed is the feed
+    DataFrame, or with stream=True the number of rows written to output_file.
+
+    excel_file is the workbook's path, its bytes or a file-like object, a dict of
+    DataFrames keyed by sheet name ('MASTER COPY', 'Sample', 'Finishes' and optionally
+    'ExampleFeed'), or a directory or JSON manifest of CSV/Parquet sheet exports. In-memory
+    inputs are never written to disk; with no output_file and save_reports=False nothing is.
 
-def generate_shopify_feed(excel_file, output_file=None, test_mode=False):
-    """Generate a Shopify product feed from MASTER COPY tab for new products"""
-    # Load the Excel file
-    master_copy_df = pd.read_excel(excel_file, sheet_name='MASTER COPY')
-    sample_df = pd.read_excel(excel_file, sheet_name='Sample')
-    finishes_df = pd.read_excel(excel_file, sheet_name='Finishes')
+    With stream=True, MASTER COPY is read a chunk at a time and each product's rows are
+    written to output_file as soon as they are built, so memory use stays flat however
+    large the catalogue is. The file has the same columns as a feed built in memory, but
+    the feed is not kept, so the number of rows written is returned in its place.
+
+    finish_catalog is an optional FinishCatalog already built from the workbook's Finishes
+    sheet, so callers that generate several feeds from one sheet only compile it once.
+    """
+    if stream and not output_file:
+        raise ValueError("An output file is needed to stream the feed")
+    
+    # Load every sheet we need from a single open of the Excel file
+    if test_mode:
+        # Test mode only reads the requested Excel rows of MASTER COPY
+        sheets, load_times = load_workbook_sheets(excel_file, sheet_names=['Sample', 'Finishes'])
+        start_row = CONFIG["test_start_row"]
+        end_row = CONFIG["test_end_row"]
+        
+        load_start = time.perf_counter()
+        sheets['MASTER COPY'] = read_sheet_window(excel_file, 'MASTER COPY', start_row, end_row)
+        load_times[f"MASTER COPY (rows {start_row}-{end_row})"] = time.perf_counter() - load_start
+    elif stream:
+        # MASTER COPY is read in chunks as the products are processed
+        sheets, load_times = load_workbook_sheets(excel_file, sheet_names=['Sample', 'Finishes'], optional_sheets=['ExampleFeed'])
+    else:
+        # The existing feed is only needed outside test mode
+        sheets, load_times = load_workbook_sheets(excel_file, optional_sheets=['ExampleFeed'])
+    print_load_times(load_times)
+    
+    sample_df = sheets['Sample']
+    finishes_df = sheets['Finishes']
+    context = build_feed_context(finishes_df, sample_df, finish_catalog)
+    template_columns = context["template_columns"]
     
-    # Create a template DataFrame for the Shopify feed using the columns from Sample tab
-    template_columns = sample_df.columns.tolist()
-    shopify_feed = pd.DataFrame(columns=template_columns)
+    # Every product's variants are added to one table, and only expanded into rows when written
+    feed_table = VariantTable(template_columns, context["variant_constants"], FEED_FIELDS["variant"],
+                              context["product_columns"])
     
     # Track products where finishes couldn't be identified
     finishes_not_found = []
@@ -196,36 +673,13 @@ def generate_shopify_feed(excel_file, output_file=None, test_mode=False):
     # Track products that couldn't be processed due to missing data
     products_not_processed = []
     
-    # Create a mapping of finish codes to full names
-    finish_code_to_name = {}
-    for col in finishes_df.columns:
-        finishes = finishes_df[col].dropna().tolist()
-        for finish in finishes:
-            if "(" in finish and ")" in finish:
-                code = finish.split("(")[1].split(")")[0].strip()
-                finish_code_to_name[code] = finish
-    
-    # Define which finishes belong to ## and x## categories
-    hash_codes = ["PN", "SN", "BZ", "AB", "SB", "DB", "BAB", "BZW", "BABW", "ABW", "DBW", "NBW", "SBW", "PBUL"]
-    xhash_codes = ["PCOP", "SCOP", "BLN", "PEW", "MBL", "ASV", "RGP", "ACOP"]
-    
     # If test_mode is True, only use the specified rows
     if test_mode:
         # Use either the default rows (14786-14787) or custom rows if provided
-        start_row = CONFIG["test_start_row"]
-        end_row = CONFIG["test_end_row"]
-        
         print(f"Running in test mode with rows {start_row}-{end_row}")
         
-        # Get all rows from MASTER COPY for product details
-        master_copy_df.index = master_copy_df.index + 1  # Convert to 1-based indexing
-        
-        # Include the row above as a reference if it's not the first row
-        if start_row > 1:
-            header_row = start_row - 1
-            product_rows = master_copy_df.loc[header_row:end_row].copy()
-        else:
-            product_rows = master_copy_df.loc[start_row:end_row].copy()
+        # MASTER COPY only holds the requested rows, indexed by Excel row number
+        product_rows = sheets['MASTER COPY'].copy()
         
         # Filter out empty rows
         valid_rows = product_rows[~product_rows.isnull().all(axis=1)].copy()
@@ -235,960 +689,112 @@ def generate_shopify_feed(excel_file, output_file=None, test_mode=False):
             return pd.DataFrame()
         
         # Group products by description - this handles multiple products in the range
-        product_groups = []
-        current_group = []
-        current_description = None
-        
-        for idx, row in valid_rows.iterrows():
-            # If the row has a description and it's different from the current one, start a new group
-            if not pd.isna(row['description']):
-                if current_description != row['description']:
-                    if current_group:
-                        product_groups.append((current_description, current_group))
-                    current_group = [row]
-                    current_description = row['description']
-                else:
-                    # Same description, add to current group
-                    current_group.append(row)
-            elif current_group:
-                # No description, but might be a continuation of current product
-                current_group.append(row)
-        
-        # Add the last group if it exists
-        if current_group:
-            product_groups.append((current_description, current_group))
+        product_index = ProductIndex(valid_rows, row_offset=0)
+        context["classifier"].classify_all(product_index.descriptions)
+        product_groups = list(product_index.products_in_range(start_row, end_row))
         
         # Process each product group separately
         print(f"Found {len(product_groups)} distinct products in the row range")
         
-        for product_num, (product_description, product_group_rows) in enumerate(product_groups):
-            if pd.isna(product_description):
-                print(f"Skipping product group {product_num+1} with no description")
-                continue
-                
-            print(f"\nProcessing product {product_num+1}: {product_description}")
-            
-            # Get tags from column K for this product group
-            tags = get_tags_from_column_k(product_group_rows)
-            if not tags:
-                print(f"Warning: No tags found in column K for product: {product_description}")
-                # Track this product as not processed due to missing tags
-                products_not_processed.append({
-                    "Product Description": product_description,
-                    "Reason": "Missing tag in column K",
-                    "Row Range": f"Rows {product_group_rows[0].name}-{product_group_rows[-1].name}" if len(product_group_rows) > 0 else "Unknown"
-                })
-                continue
-            else:
-                print(f"Found tags for product: {tags}")
-            
-            # Generate handle from product description
-            handle = clean_string(product_description)
-            
-            # Convert the list of rows back to a DataFrame
-            valid_rows_df = pd.DataFrame(product_group_rows)
-            
-            # Get all unique sizes from the valid rows
-            unique_sizes = valid_rows_df['size'].dropna().unique()
-            print(f"Unique sizes: {unique_sizes}")
-            print(f"Number of unique sizes: {len(unique_sizes)}")
-            
-            # Check if product name contains keywords for finish selection
-            keywords = ['Bjorn', 'Cadiz', 'Denham', 'Wilton', 'Capri', 'Leon', 'Oxon']
-            matching_keyword = None
-            for keyword in keywords:
-                if keyword.lower() in product_description.lower():
-                    matching_keyword = keyword
-                    break
-                    
-            # Find matching finish column based on product name
-            product_specific_finishes = None
-            if matching_keyword:
-                for col in finishes_df.columns:
-                    if matching_keyword.lower() in str(col).lower():
-                        product_specific_finishes = finishes_df[col].dropna().tolist()
-                        print(f"Found product-specific finishes for '{matching_keyword}': {len(product_specific_finishes)} finishes")
-                        break
-            
-            # Check if finish count is specified in any row
-            finish_count_specific_finishes = None
-            for idx, row in valid_rows_df.iterrows():
-                if not pd.isna(row.get('finish count')):
-                    try:
-                        finish_count = int(row['finish count'])
-                        for col in finishes_df.columns:
-                            if str(col) == str(finish_count) or str(col).startswith(str(finish_count) + ' '):
-                                finish_count_specific_finishes = finishes_df[col].dropna().tolist()
-                                print(f"Found finish count {finish_count} with {len(finish_count_specific_finishes)} finishes")
-                                break
-                        if finish_count_specific_finishes:
-                            break
-                    except (ValueError, TypeError):
-                        pass
-            
-            # Store SKU/price data by row and track which finishes each row applies to
-            row_data = {}
-            for idx, row in valid_rows_df.iterrows():
-                if not pd.isna(row['code']) and not pd.isna(row['rrp']):
-                    size = row['size'] if not pd.isna(row.get('size')) else None
-                    # Convert SKU to string and remove .0 if it's a whole number
-                    sku = str(row['code'])
-                    if sku.endswith('.0'):
-                        sku = sku[:-2]
-                    price = float(row['rrp'])
-                    finish_code = row['finish'] if not pd.isna(row['finish']) else None
-                    
-                    # Determine which finishes this row applies to
-                    applicable_finishes = []
-                    
-                    # First priority: Use product-specific finishes if available
-                    if product_specific_finishes:
-                        applicable_finishes = product_specific_finishes
-                        print(f"Row {idx}: Using {len(applicable_finishes)} product-specific finishes for '{matching_keyword}'")
-                    
-                    # Second priority: Use finish count specific finishes if available
-                    elif finish_count_specific_finishes:
-                        applicable_finishes = finish_count_specific_finishes
-                        print(f"Row {idx}: Using {len(applicable_finishes)} finishes based on finish count")
-                    
-                    # Third priority: Use finish code
-                    elif finish_code == "##":
-                        # This row applies to the 14 ## finishes
-                        applicable_finishes = [finish_code_to_name.get(code, f"Unknown ({code})") for code in hash_codes if code in finish_code_to_name]
-                        if size:
-                            print(f"Row {idx}: Size={size}, SKU={sku}, Price=£{price}, Finish=##, Applies to {len(applicable_finishes)} finishes")
-                        else:
-                            print(f"Row {idx}: No size, SKU={sku}, Price=£{price}, Finish=##, Applies to {len(applicable_finishes)} finishes")
-                    elif finish_code == "x##":
-                        # This row applies to the 8 x## finishes
-                        applicable_finishes = [finish_code_to_name.get(code, f"Unknown ({code})") for code in xhash_codes if code in finish_code_to_name]
-                        if size:
-                            print(f"Row {idx}: Size={size}, SKU={sku}, Price=£{price}, Finish=x##, Applies to {len(applicable_finishes)} finishes")
-                        else:
-                            print(f"Row {idx}: No size, SKU={sku}, Price=£{price}, Finish=x##, Applies to {len(applicable_finishes)} finishes")
-                    elif finish_code in finish_code_to_name:
-                        # This row applies to a specific finish
-                        applicable_finishes = [finish_code_to_name[finish_code]]
-                        if size:
-                            print(f"Row {idx}: Size={size}, SKU={sku}, Price=£{price}, Finish={finish_code}, Applies to {finish_code_to_name[finish_code]}")
-                        else:
-                            print(f"Row {idx}: No size, SKU={sku}, Price=£{price}, Finish={finish_code}, Applies to {finish_code_to_name[finish_code]}")
-                    else:
-                        # If we can't determine the finishes, use all finishes from column 25
-                        print(f"Warning: Row {idx} has unknown finish code {finish_code}. Using all finishes.")
-                        applicable_finishes = finishes_df[25].dropna().tolist()
-                        
-                        # Track this product as having unidentified finishes
-                        finishes_not_found.append({
-                            "Product Description": product_description,
-                            "Row Index": idx,
-                            "Size": size if size else "No size",
-                            "SKU": sku,
-                            "Finish Code": finish_code,
-                            "Reason": f"Unknown finish code: {finish_code}",
-                            "Defaulted To": f"{len(applicable_finishes)} finishes from column 25"
-                        })
-                    
-                    row_data[idx] = {
-                        "size": size,
-                        "price": price,
-                        "sku": sku,
-                        "finish_code": finish_code,
-                        "applicable_finishes": applicable_finishes,
-                        "has_size": size is not None
-                    }
-            
-            if not row_data:
-                print(f"Error: No valid SKU/price data found in rows for product: {product_description}")
-                # Track this product as not processed
-                products_not_processed.append({
-                    "Product Description": product_description,
-                    "Reason": "Missing SKU/price data",
-                    "Row Range": f"Rows {product_group_rows[0].name}-{product_group_rows[-1].name}" if len(product_group_rows) > 0 else "Unknown"
-                })
-                continue
-            
-            print(f"Found {len(row_data)} rows with valid data")
-            
-            # Get all unique finishes that will be used
-            all_applicable_finishes = []
-            for data in row_data.values():
-                all_applicable_finishes.extend(data["applicable_finishes"])
-            unique_finishes = list(set(all_applicable_finishes))
-            print(f"Total unique finishes: {len(unique_finishes)}")
-            
-            # Determine if this product has sizes or not  
-            product_has_sizes = len(unique_sizes) > 0
-            
-            # Calculate expected number of variants
-            if product_has_sizes:
-                expected_variants = len(unique_sizes) * len(unique_finishes)
-                print(f"Expected number of variants: {len(unique_sizes)} sizes × {len(unique_finishes)} finishes = {expected_variants}")
-            else:
-                expected_variants = len(unique_finishes)
-                print(f"Expected number of variants (no sizes): {len(unique_finishes)} finishes = {expected_variants}")
-            
-            # Create rows for each size-finish combination, but only where the SKU applies to that finish
-            product_rows = []
-            
-            # Track if we've already set the first-row-only fields
-            first_row_set = False
-            
-            if product_has_sizes:
-                # Process each size
-                for size in unique_sizes:
-                    # For each finish, create a row in the Shopify feed
-                    for finish in unique_finishes:
-                        # Find which row's SKU applies to this specific finish
-                        matching_row = None
-                        
-                        # First try to find an exact match for this specific finish
-                        for idx, data in row_data.items():
-                            if data["size"] == size:
-                                # Check if this is a specific finish code (not ## or x##)
-                                if data["finish_code"] in finish_code_to_name and finish == finish_code_to_name[data["finish_code"]]:
-                                    matching_row = (idx, data)
-                                    break
-                        
-                        # If no exact match found, check for ## and x## categories
-                        if matching_row is None:
-                            # Check if this finish is in the hash_codes (##) list
-                            finish_code = None
-                            for code in hash_codes:
-                                if code in finish_code_to_name and finish == finish_code_to_name[code]:
-                                    finish_code = "##"
-                                    break
-                            
-                            # If not in hash_codes, check if it's in xhash_codes (x##)
-                            if finish_code is None:
-                                for code in xhash_codes:
-                                    if code in finish_code_to_name and finish == finish_code_to_name[code]:
-                                        finish_code = "X##"
-                                        break
-                            
-                            # Now find the row with this finish_code
-                            if finish_code:
-                                for idx, data in row_data.items():
-                                    if data["size"] == size and data["finish_code"] == finish_code:
-                                        matching_row = (idx, data)
-                                        break
-                        
-                        # If still no match, fall back to the original method as a last resort
-                        if matching_row is None:
-                            for idx, data in row_data.items():
-                                if data["size"] == size and finish in data["applicable_finishes"]:
-                                    matching_row = (idx, data)
-                                    break
-                        
-                        # If no row applies to this finish, skip it
-                        if matching_row is None:
-                            continue
-                        
-                        idx, data = matching_row
-                        sku_base = data["sku"]
-                        price = data["price"]
-                        
-                        # Create new row based on template
-                        new_row = {col: None for col in template_columns}
-                        
-                        # Set values based on mapping instructions
-                        new_row['Handle'] = handle
-                        
-                        # Only set certain fields for the first row of the product
-                        is_first_row = not first_row_set
-                        
-                        if is_first_row:
-                            new_row['Title'] = product_description
-                            # Set Image Alt Text to match the Title
-                            new_row['Image Alt Text'] = product_description
-                            new_row['Vendor'] = "vendor-unknown"
-                            new_row['Product Category'] = "Uncategorized"
-                            new_row['Type'] = get_product_type(product_description)
-                            # Use string "TRUE" instead of boolean True
-                            new_row['Published'] = "TRUE"
-                            new_row['Option1 Name'] = "Size"
-                            new_row['Option2 Name'] = "Finish"
-                            
-                            # Use an example image from sample
-                            if not sample_df.empty and 'Image Src' in sample_df.columns and not pd.isna(sample_df['Image Src'].iloc[0]):
-                                new_row['Image Src'] = sample_df['Image Src'].iloc[0]
-                                
-                            new_row['Image Position'] = 1
-                            new_row['Gift Card'] = "FALSE"
-                            new_row['SEO Title'] = f"{product_description} | A&H Brass"
-                            
-                            # Set Tags from column K
-                            new_row['Tags'] = tags
-                            
-                            # Set regional inclusion - use "TRUE" string instead of boolean True
-                            for region in ['United Kingdom', 'Australia', 'Canada', 'Europe', 'International', 'United States']:
-                                new_row[f'Included / {region}'] = "TRUE"
-                            
-                            new_row['Status'] = "draft"
-                            
-                            # Mark that we've set the first row fields
-                            first_row_set = True
-                        
-                        # Set variant-specific values
-                        new_row['Option1 Value'] = clean_option_value(size, "Size")
-                        new_row['Option2 Value'] = finish
-                        
-                        # Set SKU - the original SKU from the row that applies to this finish
-                        new_row['Variant SKU'] = sku_base
-                        new_row['Variant Grams'] = 0
-                        new_row['Variant Inventory Tracker'] = "shopify"
-                        new_row['Variant Inventory Qty'] = 10000
-                        new_row['Variant Inventory Policy'] = "deny"
-                        new_row['Variant Fulfillment Service'] = "manual"
-                        new_row['Variant Price'] = price
-                        
-                        # Set these as string literals
-                        new_row['Variant Requires Shipping'] = "TRUE"
-                        new_row['Variant Taxable'] = "TRUE"
-                        
-                        # Use the same image for all variants
-                        if not sample_df.empty and 'Image Src' in sample_df.columns and not pd.isna(sample_df['Image Src'].iloc[0]):
-                            new_row['Variant Image'] = sample_df['Image Src'].iloc[0]
-                            
-                        new_row['Variant Weight Unit'] = "kg"
-                        
-                        # Add the row to our product rows
-                        product_rows.append(new_row)
-            else:
-                # Process products without sizes - finishes become Option1
-                for finish in unique_finishes:
-                    # Find which row's SKU applies to this specific finish
-                    matching_row = None
-                    
-                    # First try to find an exact match for this specific finish
-                    for idx, data in row_data.items():
-                        if not data["has_size"]:  # Only consider rows without sizes
-                            # Check if this is a specific finish code (not ## or x##)
-                            if data["finish_code"] in finish_code_to_name and finish == finish_code_to_name[data["finish_code"]]:
-                                matching_row = (idx, data)
-                                break
-                    
-                    # If no exact match found, check for ## and x## categories
-                    if matching_row is None:
-                        # Check if this finish is in the hash_codes (##) list
-                        finish_code = None
-                        for code in hash_codes:
-                            if code in finish_code_to_name and finish == finish_code_to_name[code]:
-                                finish_code = "##"
-                                break
-                        
-                        # If not in hash_codes, check if it's in xhash_codes (x##)
-                        if finish_code is None:
-                            for code in xhash_codes:
-                                if code in finish_code_to_name and finish == finish_code_to_name[code]:
-                                    finish_code = "X##"
-                                    break
-                        
-                        # Now find the row with this finish_code
-                        if finish_code:
-                            for idx, data in row_data.items():
-                                if not data["has_size"] and data["finish_code"] == finish_code:
-                                    matching_row = (idx, data)
-                                    break
-                    
-                    # If still no match, fall back to the original method as a last resort
-                    if matching_row is None:
-                        for idx, data in row_data.items():
-                            if not data["has_size"] and finish in data["applicable_finishes"]:
-                                matching_row = (idx, data)
-                                break
-                    
-                    # If no row applies to this finish, skip it
-                    if matching_row is None:
-                        continue
-                    
-                    idx, data = matching_row
-                    sku_base = data["sku"]
-                    price = data["price"]
-                    
-                    # Create new row based on template
-                    new_row = {col: None for col in template_columns}
-                    
-                    # Set values based on mapping instructions
-                    new_row['Handle'] = handle
-                    
-                    # Only set certain fields for the first row of the product
-                    is_first_row = not first_row_set
-                    
-                    if is_first_row:
-                        new_row['Title'] = product_description
-                        # Set Image Alt Text to match the Title
-                        new_row['Image Alt Text'] = product_description
-                        new_row['Vendor'] = "vendor-unknown"
-                        new_row['Product Category'] = "Uncategorized"
-                        new_row['Type'] = get_product_type(product_description)
-                        # Use string "TRUE" instead of boolean True
-                        new_row['Published'] = "TRUE"
-                        
-                        # For products without sizes - set Option1 to Finish, leave Option2 empty
-                        new_row['Option1 Name'] = "Finish"
-                        # Option2 Name is left as None/empty
-                        
-                        # Use an example image from sample
-                        if not sample_df.empty and 'Image Src' in sample_df.columns and not pd.isna(sample_df['Image Src'].iloc[0]):
-                            new_row['Image Src'] = sample_df['Image Src'].iloc[0]
-                            
-                        new_row['Image Position'] = 1
-                        new_row['Gift Card'] = "FALSE"
-                        new_row['SEO Title'] = f"{product_description} | A&H Brass"
-                        
-                        # Set Tags from column K
-                        new_row['Tags'] = tags
-                        
-                        # Set regional inclusion - use "TRUE" string instead of boolean True
-                        for region in ['United Kingdom', 'Australia', 'Canada', 'Europe', 'International', 'United States']:
-                            new_row[f'Included / {region}'] = "TRUE"
-                        
-                        new_row['Status'] = "draft"
-                        
-                        # Mark that we've set the first row fields
-                        first_row_set = True
-                    
-                    # Set variant-specific values for products without sizes
-                    new_row['Option1 Value'] = clean_option_value(finish, "Finish")  # Finish goes to Option1
-                    # Option2 Value is left as None/empty
-                    
-                    # Set SKU - the original SKU from the row that applies to this finish
-                    new_row['Variant SKU'] = sku_base
-                    new_row['Variant Grams'] = 0
-                    new_row['Variant Inventory Tracker'] = "shopify"
-                    new_row['Variant Inventory Qty'] = 10000
-                    new_row['Variant Inventory Policy'] = "deny"
-                    new_row['Variant Fulfillment Service'] = "manual"
-                    new_row['Variant Price'] = price
-                    
-                    # Set these as string literals
-                    new_row['Variant Requires Shipping'] = "TRUE"
-                    new_row['Variant Taxable'] = "TRUE"
-                    
-                    # Use the same image for all variants
-                    if not sample_df.empty and 'Image Src' in sample_df.columns and not pd.isna(sample_df['Image Src'].iloc[0]):
-                        new_row['Variant Image'] = sample_df['Image Src'].iloc[0]
-                        
-                    new_row['Variant Weight Unit'] = "kg"
-                    
-                    # Add the row to our product rows
-                    product_rows.append(new_row)
-            
-            # Add all product rows to the Shopify feed
-            for row in product_rows:
-                new_df = pd.DataFrame([row])
-                shopify_feed = pd.concat([shopify_feed, new_df], ignore_index=True)
+        processed_products = (
+            process_test_product_group(product_num, product_description, product_group_rows, context, feed_table,
+                                       finishes_not_found, products_not_processed)
+            for product_num, (product_description, product_group_rows) in enumerate(product_groups)
+        )
+    
+    elif stream:
+        # Products are grouped as the rows are read, so only the current group is held in memory
+        existing_feed_df = sheets.get('ExampleFeed')
+        if existing_feed_df is None:
+            print("Could not load existing feed: Worksheet named 'ExampleFeed' not found")
+        product_groups = (group for _, group in iter_product_groups(iter_new_product_chunks(excel_file, existing_feed_df)))
+        
+        processed_products = (
+            process_product_group(product_group, context, feed_table, finishes_not_found, products_not_processed)
+            for product_group in product_groups
+        )
     
     else:
         # Normal processing for non-test mode
+        master_copy_df = sheets['MASTER COPY']
+        
         # Find new products
         try:
-            existing_feed_df = pd.read_excel(excel_file, sheet_name='ExampleFeed')
-            new_products_df = find_new_products(master_copy_df, existing_feed_df)
+            if 'ExampleFeed' not in sheets:
+                raise ValueError("Worksheet named 'ExampleFeed' not found")
+            new_products_df = find_new_products(master_copy_df, sheets['ExampleFeed'])
             print(f"Found {len(new_products_df)} new products to add")
         except Exception as e:
             print(f"Could not load existing feed: {e}")
             new_products_df = master_copy_df
         
-        # Group products by description
-        product_groups = group_products(new_products_df)
-        print(f"Grouped into {len(product_groups)} product sets")
+        # Group products by description, then classify every product's description in one pass
+        product_index = ProductIndex(new_products_df)
+        context["classifier"].classify_all(product_index.descriptions)
+        print(f"Grouped into {len(product_index)} product sets")
         
         # Process each product group
-        for product_group in product_groups:
-            product_rows = []
-            
-            # Get product details from the first row
-            first_row = product_group[0]
-            product_description = first_row['description']
-            
-            # Skip if no description
-            if pd.isna(product_description):
-                continue
-            
-            print(f"Processing product: {product_description}")
-            
-            # Get tags from column K for this product group
-            tags = get_tags_from_column_k(product_group)
-            if not tags:
-                print(f"Warning: No tags found in column K for product: {product_description}")
-                # Track this product as not processed due to missing tags
-                products_not_processed.append({
-                    "Product Description": product_description,
-                    "Reason": "Missing tag in column K",
-                    "Row Range": f"Product group with {len(product_group)} rows"
-                })
-                continue
-            else:
-                print(f"Found tags for product: {tags}")
-            
-            # Generate handle from product description
-            handle = clean_string(product_description)
-            
-            # Determine product type
-            product_type = get_product_type(product_description)
-            
-            # Get unique sizes for this product, but keep all rows for processing
-            all_rows = product_group
-            valid_rows = [row for row in product_group if not pd.isna(row.get('code')) and not pd.isna(row.get('rrp'))]
-            
-            # Check if this product has any sizes
-            rows_with_sizes = [row for row in valid_rows if not pd.isna(row.get('size'))]
-            rows_without_sizes = [row for row in valid_rows if pd.isna(row.get('size'))]
-            
-            has_sizes = len(rows_with_sizes) > 0
-            unique_sizes = list(set([row['size'] for row in rows_with_sizes if not pd.isna(row['size'])])) if has_sizes else []
-            
-            print(f"  Found {len(unique_sizes)} unique sizes, {len(rows_without_sizes)} rows without sizes")
-            
-            # Use all valid rows (both with and without sizes) for processing
-            valid_rows = rows_with_sizes + rows_without_sizes
-            
-            # Check if product name contains keywords for finish selection
-            keywords = ['Bjorn', 'Cadiz', 'Denham', 'Wilton', 'Capri', 'Leon', 'Oxon']
-            matching_keyword = None
-            for keyword in keywords:
-                if keyword.lower() in product_description.lower():
-                    matching_keyword = keyword
-                    break
-                    
-            # Find matching finish column based on product name
-            product_specific_finishes = None
-            if matching_keyword:
-                for col in finishes_df.columns:
-                    if matching_keyword.lower() in str(col).lower():
-                        product_specific_finishes = finishes_df[col].dropna().tolist()
-                        print(f"  Found product-specific finishes for '{matching_keyword}': {len(product_specific_finishes)} finishes")
-                        break
-            
-            # Check if finish count is specified in any row
-            finish_count_specific_finishes = None
-            for i, row in enumerate(valid_rows):
-                if not pd.isna(row.get('finish count')):
-                    try:
-                        finish_count = int(row['finish count'])
-                        for col in finishes_df.columns:
-                            if str(col) == str(finish_count) or str(col).startswith(str(finish_count) + ' '):
-                                finish_count_specific_finishes = finishes_df[col].dropna().tolist()
-                                print(f"  Found finish count {finish_count} with {len(finish_count_specific_finishes)} finishes")
-                                break
-                        if finish_count_specific_finishes:
-                            break
-                    except (ValueError, TypeError):
-                        pass
-            
-            # Store data by row and track which finishes each row applies to
-            row_data = {}
-            for i, row in enumerate(valid_rows):
-                if pd.isna(row.get('code')) or pd.isna(row.get('rrp')):
-                    continue
-                    
-                size = row['size'] if not pd.isna(row.get('size')) else None
-                # Convert SKU to string and remove .0 if it's a whole number
-                sku = str(row['code'])
-                if sku.endswith('.0'):
-                    sku = sku[:-2]
-                price = float(row['rrp'])
-                finish_code = row['finish'] if not pd.isna(row['finish']) else None
-                
-                # Determine which finishes this row applies to
-                applicable_finishes = []
-                
-                # First priority: Use product-specific finishes if available
-                if product_specific_finishes:
-                    applicable_finishes = product_specific_finishes
-                    print(f"  Row {i}: Using {len(applicable_finishes)} product-specific finishes for '{matching_keyword}'")
-                
-                # Second priority: Use finish count specific finishes if available
-                elif finish_count_specific_finishes:
-                    applicable_finishes = finish_count_specific_finishes
-                    print(f"  Row {i}: Using {len(applicable_finishes)} finishes based on finish count")
-                
-                # Third priority: Use finish code
-                elif finish_code == "##":
-                    # This row applies to the 14 ## finishes
-                    applicable_finishes = [finish_code_to_name.get(code, f"Unknown ({code})") for code in hash_codes if code in finish_code_to_name]
-                    print(f"  Row {i}: Size={size}, SKU={sku}, Price=£{price}, Finish=##, Applies to {len(applicable_finishes)} finishes")
-                elif finish_code == "x##":
-                    # This row applies to the 8 x## finishes
-                    applicable_finishes = [finish_code_to_name.get(code, f"Unknown ({code})") for code in xhash_codes if code in finish_code_to_name]
-                    print(f"  Row {i}: Size={size}, SKU={sku}, Price=£{price}, Finish=x##, Applies to {len(applicable_finishes)} finishes")
-                elif finish_code in finish_code_to_name:
-                    # This row applies to a specific finish
-                    applicable_finishes = [finish_code_to_name[finish_code]]
-                    print(f"  Row {i}: Size={size}, SKU={sku}, Price=£{price}, Finish={finish_code}, Applies to {finish_code_to_name[finish_code]}")
-                else:
-                    # If we can't determine the finishes, use all finishes from column 25
-                    print(f"  Warning: Row {i} has unknown finish code {finish_code}. Using all finishes.")
-                    applicable_finishes = finishes_df[25].dropna().tolist()
-                    
-                    # Track this product as having unidentified finishes
-                    finishes_not_found.append({
-                        "Product Description": product_description,
-                        "Row Index": f"Row {i}",
-                        "Size": size,
-                        "SKU": sku,
-                        "Finish Code": finish_code,
-                        "Reason": f"Unknown finish code: {finish_code}",
-                        "Defaulted To": f"{len(applicable_finishes)} finishes from column 25"
-                    })
-                
-                row_data[i] = {
-                    "size": size,
-                    "price": price,
-                    "sku": sku,
-                    "finish_code": finish_code,
-                    "applicable_finishes": applicable_finishes,
-                    "row": row,  # Keep original row data for reference
-                    "has_size": size is not None
-                }
-            
-            if not row_data:
-                print(f"Error: No valid SKU/price data found in rows for product: {product_description}")
-                # Track this product as not processed
-                products_not_processed.append({
-                    "Product Description": product_description,
-                    "Reason": "Missing SKU/price data",
-                    "Row Range": f"Rows {product_group_rows[0].name}-{product_group_rows[-1].name}" if len(product_group_rows) > 0 else "Unknown"
-                })
-                continue
-            
-            # Get all unique finishes that will be used
-            all_applicable_finishes = []
-            for data in row_data.values():
-                all_applicable_finishes.extend(data["applicable_finishes"])
-            unique_finishes = list(set(all_applicable_finishes))
-            
-            # Determine if this product has sizes or not
-            product_has_sizes = len(unique_sizes) > 0
-            
-            # Calculate expected number of variants
-            if product_has_sizes:
-                expected_variants = len(unique_sizes) * len(unique_finishes)
-                print(f"  Expected variants: {len(unique_sizes)} sizes × {len(unique_finishes)} finishes = {expected_variants}")
-            else:
-                expected_variants = len(unique_finishes)
-                print(f"  Expected variants (no sizes): {len(unique_finishes)} finishes = {expected_variants}")
-            
-            # Create Shopify rows for each size-finish combination, but only where the SKU applies
-            is_first_row = True
-            
-            if product_has_sizes:
-                # Process each size
-                for size in unique_sizes:
-                    # For each finish, create a row in the Shopify feed
-                    for finish in unique_finishes:
-                        # Find which row's SKU applies to this specific finish
-                        matching_row = None
-                        
-                        # First try to find an exact match for this specific finish
-                        for idx, data in row_data.items():
-                            if data["size"] == size:
-                                # Check if this is a specific finish code (not ## or x##)
-                                if data["finish_code"] in finish_code_to_name and finish == finish_code_to_name[data["finish_code"]]:
-                                    matching_row = (idx, data)
-                                    break
-                        
-                        # If no exact match found, check for ## and x## categories
-                        if matching_row is None:
-                            # Check if this finish is in the hash_codes (##) list
-                            finish_code = None
-                            for code in hash_codes:
-                                if code in finish_code_to_name and finish == finish_code_to_name[code]:
-                                    finish_code = "##"
-                                    break
-                            
-                            # If not in hash_codes, check if it's in xhash_codes (x##)
-                            if finish_code is None:
-                                for code in xhash_codes:
-                                    if code in finish_code_to_name and finish == finish_code_to_name[code]:
-                                        finish_code = "X##"
-                                        break
-                            
-                            # Now find the row with this finish_code
-                            if finish_code:
-                                for idx, data in row_data.items():
-                                    if data["size"] == size and data["finish_code"] == finish_code:
-                                        matching_row = (idx, data)
-                                        break
-                        
-                        # If still no match, fall back to the original method as a last resort
-                        if matching_row is None:
-                            for idx, data in row_data.items():
-                                if data["size"] == size and finish in data["applicable_finishes"]:
-                                    matching_row = (idx, data)
-                                    break
-                        
-                        # If no row applies to this finish, skip it
-                        if matching_row is None:
-                            continue
-                        
-                        idx, data = matching_row
-                        sku_base = data["sku"]
-                        price = data["price"]
-                        
-                        # Create new row based on template
-                        new_row = {col: None for col in template_columns}
-                        
-                        # Set values based on mapping instructions
-                        new_row['Handle'] = handle
-                        
-                        # Only set certain fields for the first row of the product
-                        if is_first_row:
-                            new_row['Title'] = product_description
-                            # Set Image Alt Text to match the Title
-                            new_row['Image Alt Text'] = product_description
-                            new_row['Vendor'] = "vendor-unknown"
-                            new_row['Product Category'] = "Uncategorized"
-                            new_row['Type'] = product_type
-                            # Use string "TRUE" instead of boolean True
-                            new_row['Published'] = "TRUE"
-                            
-                            # For products with sizes - set Option1 to Size, Option2 to Finish
-                            # Check if this is a lever handle on plate for Option1 Name
-                            if any(tag in product_description.lower() for tag in ["lever handles on plate", "lever handle on plate"]):
-                                new_row['Option1 Name'] = "Option"
-                            else:
-                                new_row['Option1 Name'] = "Size"
-                                
-                            new_row['Option2 Name'] = "Finish"
-                            
-                            # Use an example image from sample
-                            if not sample_df.empty and 'Image Src' in sample_df.columns and not pd.isna(sample_df['Image Src'].iloc[0]):
-                                new_row['Image Src'] = sample_df['Image Src'].iloc[0]
-                                
-                            new_row['Image Position'] = 1
-                            new_row['Gift Card'] = "FALSE"
-                            new_row['SEO Title'] = f"{product_description} | A&H Brass"
-                            
-                            # Set Tags from column K
-                            new_row['Tags'] = tags
-                            
-                            # Set regional inclusion - use "TRUE" string instead of boolean True
-                            for region in ['United Kingdom', 'Australia', 'Canada', 'Europe', 'International', 'United States']:
-                                new_row[f'Included / {region}'] = "TRUE"
-                            
-                            new_row['Status'] = "draft"
-                            
-                            # Mark that we've set the first row fields
-                            is_first_row = False
-                        
-                        # Set variant-specific values for products with sizes
-                        new_row['Option1 Value'] = clean_option_value(size, "Size")
-                        new_row['Option2 Value'] = finish
-                        new_row['Variant SKU'] = sku_base
-                        new_row['Variant Grams'] = 0
-                        new_row['Variant Inventory Tracker'] = "shopify"
-                        new_row['Variant Inventory Qty'] = 10000
-                        new_row['Variant Inventory Policy'] = "deny"
-                        new_row['Variant Fulfillment Service'] = "manual"
-                        new_row['Variant Price'] = price
-                        
-                        # Set these as string literals
-                        new_row['Variant Requires Shipping'] = "TRUE"
-                        new_row['Variant Taxable'] = "TRUE"
-                        
-                        # Use the same image for all variants
-                        if not sample_df.empty and 'Image Src' in sample_df.columns and not pd.isna(sample_df['Image Src'].iloc[0]):
-                            new_row['Variant Image'] = sample_df['Image Src'].iloc[0]
-                            
-                        new_row['Variant Weight Unit'] = "kg"
-                        
-                        # Add the row to our product rows
-                        product_rows.append(new_row)
-            else:
-                # Process products without sizes - finishes become Option1
-                for finish in unique_finishes:
-                    # Find which row's SKU applies to this specific finish
-                    matching_row = None
-                    
-                    # First try to find an exact match for this specific finish
-                    for idx, data in row_data.items():
-                        if not data["has_size"]:  # Only consider rows without sizes
-                            # Check if this is a specific finish code (not ## or x##)
-                            if data["finish_code"] in finish_code_to_name and finish == finish_code_to_name[data["finish_code"]]:
-                                matching_row = (idx, data)
-                                break
-                    
-                    # If no exact match found, check for ## and x## categories
-                    if matching_row is None:
-                        # Check if this finish is in the hash_codes (##) list
-                        finish_code = None
-                        for code in hash_codes:
-                            if code in finish_code_to_name and finish == finish_code_to_name[code]:
-                                finish_code = "##"
-                                break
-                        
-                        # If not in hash_codes, check if it's in xhash_codes (x##)
-                        if finish_code is None:
-                            for code in xhash_codes:
-                                if code in finish_code_to_name and finish == finish_code_to_name[code]:
-                                    finish_code = "X##"
-                                    break
-                        
-                        # Now find the row with this finish_code
-                        if finish_code:
-                            for idx, data in row_data.items():
-                                if not data["has_size"] and data["finish_code"] == finish_code:
-                                    matching_row = (idx, data)
-                                    break
-                    
-                    # If still no match, fall back to the original method as a last resort
-                    if matching_row is None:
-                        for idx, data in row_data.items():
-                            if not data["has_size"] and finish in data["applicable_finishes"]:
-                                matching_row = (idx, data)
-                                break
-                    
-                    # If no row applies to this finish, skip it
-                    if matching_row is None:
-                        continue
-                    
-                    idx, data = matching_row
-                    sku_base = data["sku"]
-                    price = data["price"]
-                    
-                    # Create new row based on template
-                    new_row = {col: None for col in template_columns}
-                    
-                    # Set values based on mapping instructions
-                    new_row['Handle'] = handle
-                    
-                    # Only set certain fields for the first row of the product
-                    if is_first_row:
-                        new_row['Title'] = product_description
-                        # Set Image Alt Text to match the Title
-                        new_row['Image Alt Text'] = product_description
-                        new_row['Vendor'] = "vendor-unknown"
-                        new_row['Product Category'] = "Uncategorized"
-                        new_row['Type'] = product_type
-                        # Use string "TRUE" instead of boolean True
-                        new_row['Published'] = "TRUE"
-                        
-                        # For products without sizes - set Option1 to Finish, leave Option2 empty
-                        new_row['Option1 Name'] = "Finish"
-                        # Option2 Name is left as None/empty
-                        
-                        # Use an example image from sample
-                        if not sample_df.empty and 'Image Src' in sample_df.columns and not pd.isna(sample_df['Image Src'].iloc[0]):
-                            new_row['Image Src'] = sample_df['Image Src'].iloc[0]
-                            
-                        new_row['Image Position'] = 1
-                        new_row['Gift Card'] = "FALSE"
-                        new_row['SEO Title'] = f"{product_description} | A&H Brass"
-                        
-                        # Set Tags from column K
-                        new_row['Tags'] = tags
-                        
-                        # Set regional inclusion - use "TRUE" string instead of boolean True
-                        for region in ['United Kingdom', 'Australia', 'Canada', 'Europe', 'International', 'United States']:
-                            new_row[f'Included / {region}'] = "TRUE"
-                        
-                        new_row['Status'] = "draft"
-                        
-                        # Mark that we've set the first row fields
-                        is_first_row = False
-                    
-                    # Set variant-specific values for products without sizes
-                    new_row['Option1 Value'] = clean_option_value(finish, "Finish")  # Finish goes to Option1
-                    # Option2 Value is left as None/empty
-                    new_row['Variant SKU'] = sku_base
-                    new_row['Variant Grams'] = 0
-                    new_row['Variant Inventory Tracker'] = "shopify"
-                    new_row['Variant Inventory Qty'] = 10000
-                    new_row['Variant Inventory Policy'] = "deny"
-                    new_row['Variant Fulfillment Service'] = "manual"
-                    new_row['Variant Price'] = price
-                    
-                    # Set these as string literals
-                    new_row['Variant Requires Shipping'] = "TRUE"
-                    new_row['Variant Taxable'] = "TRUE"
-                    
-                    # Use the same image for all variants
-                    if not sample_df.empty and 'Image Src' in sample_df.columns and not pd.isna(sample_df['Image Src'].iloc[0]):
-                        new_row['Variant Image'] = sample_df['Image Src'].iloc[0]
-                        
-                    new_row['Variant Weight Unit'] = "kg"
-                    
-                    # Add the row to our product rows
-                    product_rows.append(new_row)
-            
-            # Add all product rows to the Shopify feed
-            for row in product_rows:
-                new_df = pd.DataFrame([row])
-                shopify_feed = pd.concat([shopify_feed, new_df], ignore_index=True)
-    
-    # Explicitly convert boolean columns to string literals "TRUE" or "FALSE"
-    boolean_columns = ['Published', 'Variant Requires Shipping', 'Variant Taxable', 'Gift Card']
-    for col in boolean_columns:
-        if col in shopify_feed.columns:
-            shopify_feed[col] = shopify_feed[col].apply(
-                lambda x: "TRUE" if (x is True or x == 1 or x == "TRUE" or x == "True" or x == 1.0) 
-                else ("FALSE" if (x is False or x == 0 or x == "FALSE" or x == "False" or x == 0.0) 
-                else x)
-            )
-    
-    # Make sure all regional inclusion columns use "TRUE"
-    inclusion_columns = [col for col in shopify_feed.columns if col.startswith('Included /')]
-    for col in inclusion_columns:
-        shopify_feed[col] = shopify_feed[col].apply(
-            lambda x: "TRUE" if (x is True or x == 1 or x == "TRUE" or x == "True" or x == 1.0) 
-            else x
+        processed_products = (
+            process_product_group(product_group, context, feed_table, finishes_not_found, products_not_processed)
+            for _, product_group in product_index.products()
         )
     
-    # If output file is specified, save the feed
-    if output_file:
-        # Save to temporary file to prevent pandas from converting "TRUE"/"FALSE" to boolean
-        temp_file = f"temp_{output_file}"
-        shopify_feed.to_excel(temp_file, index=False)
-        
-        # Read back the file and ensure boolean columns are strings
-        df = pd.read_excel(temp_file)
-        for col in boolean_columns + inclusion_columns:
-            if col in df.columns:
-                df[col] = df[col].apply(
-                    lambda x: "TRUE" if (x is True or x == 1 or x == "TRUE" or x == "True" or x == 1.0) 
-                    else ("FALSE" if (x is False or x == 0 or x == "FALSE" or x == "False" or x == 0.0) 
-                    else x)
-                )
-        
-        # Save the final file
-        df.to_excel(output_file, index=False)
+    if stream:
+        # Write each product's rows out as soon as they are built, under the same columns
+        # a feed built in memory gets
+        with FeedWriter(output_file, feed_table.feed_columns()) as writer:
+            for _ in processed_products:
+                writer.write_rows(feed_table.rows())
+                feed_table.clear()
+        shopify_feed = writer.rows_written
+        print(f"Shopify feed streamed to {output_file} ({writer.rows_written} rows)")
+    else:
+        # Process every product, then build the feed frame from the table once
+        for _ in processed_products:
+            pass
+        shopify_feed = feed_table.to_frame()
         
-        # Clean up temporary file
-        import os
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-            
-        print(f"Shopify feed saved to {output_file}")
+        # The feed is saved once, through the same write-only writer as a streamed feed,
+        # which keeps the TRUE/FALSE columns as text
+        if output_file:
+            with FeedWriter(output_file, shopify_feed.columns) as writer:
+                writer.write_frame(shopify_feed)
+            print(f"Shopify feed saved to {output_file}")
     
     # Export finishes not found to CSV if there are any
     if finishes_not_found:
-        finishes_not_found_df = pd.DataFrame(finishes_not_found)
-        csv_filename = "finishes_not_found.csv"
-        finishes_not_found_df.to_csv(csv_filename, index=False)
         print(f"⚠️  Found {len(finishes_not_found)} products with unidentified finishes")
-        print(f"📄 Details exported to {csv_filename}")
+        if save_reports:
+            finishes_not_found_df = pd.DataFrame(finishes_not_found)
+            csv_filename = "finishes_not_found.csv"
+            finishes_not_found_df.to_csv(csv_filename, index=False)
+            print(f"📄 Details exported to {csv_filename}")
     else:
         print("✅ All products had identifiable finishes")
     
     # Export products not processed to CSV if there are any
     if products_not_processed:
-        products_not_processed_df = pd.DataFrame(products_not_processed)
-        csv_filename = "products_not_processed.csv"
-        products_not_processed_df.to_csv(csv_filename, index=False)
         print(f"⚠️  Found {len(products_not_processed)} products that couldn't be processed")
-        print(f"📄 Details exported to {csv_filename}")
+        if save_reports:
+            products_not_processed_df = pd.DataFrame(products_not_processed)
+            csv_filename = "products_not_processed.csv"
+            products_not_processed_df.to_csv(csv_filename, index=False)
+            print(f"📄 Details exported to {csv_filename}")
     
     return shopify_feed, finishes_not_found, products_not_processed
 
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Generate Shopify product feed from MASTER COPY Excel file')
-    parser.add_argument('--input', '-i', default='MASTER COPY.xlsx', help='Input Excel file path')
+    parser.add_argument('--input', '-i', default='MASTER COPY.xlsx', help='Input Excel file path, or a directory or JSON manifest of CSV/Parquet sheet exports')
     parser.add_argument('--output', '-o', help='Output Excel file path')
     parser.add_argument('--test', '-t', action='store_true', help='Run in test mode with example rows')
-    parser.add_argument('--rows', '-r', help='Custom row numbers to process in format "start-end" (e.g., "14786-14787")')
+    parser.add_argument('--rows', '-r', help='Custom Excel row numbers to process in format "start-end" (e.g., "14786-14787")')
+    parser.add_argument('--no-cache', action='store_true', help='Always parse the workbook instead of using the parsed-sheet cache')
+    parser.add_argument('--clear-cache', action='store_true', help='Delete every cached workbook before running')
+    parser.add_argument('--reader', choices=list(READER_BACKENDS), default=READER_CONFIG["backend"],
+                        help='Workbook reader backend (calamine needs the python-calamine package)')
+    parser.add_argument('--stream', '-s', action='store_true', help='Read MASTER COPY in chunks and write the feed as it is built, keeping memory use flat (the sample printed at the end is read back from the output file)')
     parser.add_argument('--version', '-v', action='store_true', help='Display version information')
     
     args = parser.parse_args()
@@ -1201,6 +807,13 @@ if __name__ == "__main__":
     # Print version header
     print(f"Running {__description__} v{__version__}")
     
+    if args.clear_cache:
+        clear_cache()
+        print(f"Cleared the parsed-sheet cache in {CACHE_CONFIG['cache_dir']}")
+    if args.no_cache:
+        CACHE_CONFIG["enabled"] = False
+    READER_CONFIG["backend"] = args.reader
+    
     # If no output file specified, create one with timestamp
     if not args.output:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -1217,17 +830,12 @@ if __name__ == "__main__":
             CONFIG["test_start_row"] = start_row
             CONFIG["test_end_row"] = end_row
             
-            # Load the Excel file
-            df = pd.read_excel(args.input, sheet_name='MASTER COPY')
-            df.index = df.index + 1  # Convert to 1-based indexing
-            
             # Check if rows exist in the Excel file
-            # Use openpyxl to get accurate row count (pandas can miss rows)
+            # Use the sheet's declared dimension for an accurate row count (pandas can miss rows)
+            row_range_verified = False
             try:
-                wb = openpyxl.load_workbook(args.input, read_only=True)
-                sheet = wb['MASTER COPY']
-                max_row = sheet.max_row
-                wb.close()
+                max_row = get_sheet_max_row(args.input, 'MASTER COPY')
+                row_range_verified = True
                 
                 if start_row > max_row:
                     print(f"Error: Row {start_row} not found in the MASTER COPY sheet (max row is {max_row})")
@@ -1240,30 +848,24 @@ if __name__ == "__main__":
                     # Update the configuration
                     CONFIG["test_end_row"] = end_row
             except Exception as e:
-                print(f"Warning: Unable to verify row range with openpyxl: {e}")
+                print(f"Warning: Unable to verify row range from the sheet dimension: {e}")
                 print("Falling back to pandas row verification...")
-                
-                # Original pandas check as fallback
-                if start_row not in df.index:
-                    print(f"Error: Row {start_row} not found in the MASTER COPY sheet (max row is {df.index[-1]})")
+            
+            # Read only the requested Excel rows instead of the whole sheet
+            product_rows = read_sheet_window(args.input, 'MASTER COPY', start_row, end_row)
+            
+            if not row_range_verified:
+                # Fall back to checking the rows that were actually read
+                if max(start_row, FIRST_DATA_ROW) not in product_rows.index:
+                    print(f"Error: Row {start_row} not found in the MASTER COPY sheet")
                     exit(1)
                 
-                if end_row not in df.index:
-                    last_row = df.index[-1]
+                if end_row not in product_rows.index:
+                    last_row = product_rows.index[-1]
                     print(f"Warning: Row {end_row} not found in the MASTER COPY sheet. Adjusting to last available row: {last_row}")
                     end_row = last_row
                     # Update the configuration
                     CONFIG["test_end_row"] = end_row
-            
-            # Always include the header row if not already included
-            if start_row > 1:
-                header_row = start_row - 1
-                print(f"Including header row {header_row} for reference")
-                
-                # Extract the product rows including header row
-                product_rows = df.loc[header_row:end_row]
-            else:
-                product_rows = df.loc[start_row:end_row]
                 
             # Check if we have valid data
             if product_rows.empty:
@@ -1288,8 +890,15 @@ if __name__ == "__main__":
             print(f"Error processing custom rows: {e}")
             exit(1)
     
-    feed, finishes_not_found, products_not_processed = generate_shopify_feed(args.input, args.output, args.test)
-    print(f"Generated {len(feed)} rows in the Shopify feed")
+    feed, finishes_not_found, products_not_processed = generate_shopify_feed(args.input, args.output, args.test, args.stream)
+    
+    if args.stream:
+        # A streamed feed comes back as its row count, as the feed itself is only on disk;
+        # read back just the rows shown below
+        print(f"Generated {feed} rows in the Shopify feed")
+        feed = pd.read_excel(args.output, nrows=10)
+    else:
+        print(f"Generated {len(feed)} rows in the Shopify feed")
     
     # Print sample of the feed
     print("\nSample of generated Shopify feed:")
@@ -0,0 +1,74 @@
+"""
+Shared fixtures for the Shopify Feed Generator tests
+"""
+import os
+import sys
+import openpyxl
+import pandas as pd
+import pytest
+
+# The generator's modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import workbook_loader
+
+# tests/utilities holds one-off scripts run against real workbooks, not tests
+collect_ignore = ["utilities"]
+
+MASTER_COPY_ROWS = [
+    ['description', 'size', 'code', 'rrp', 'finish', 'finish count'],
+    ['Sample Lever Handle', '150mm x 50mm', 'SMP001/1', 25.5, '##', 14],
+    ['Sample Lever Handle', '200mm x 50mm', 'SMP001/2', 28.5, '##', 14],
+    ['Sample Cupboard Knob', '25mm', 'SMP002/1', 15.5, 'x##', 8],
+    ['Sample Cupboard Knob', '32mm', 'SMP002/2', 18.5, 'x##', 8],
+]
+
+FINISHES_ROWS = [
+    [14, 8],
+    ['Factory Finished Polished Nickel (PN)', 'Polished Brass (PB)'],
+    ['Factory Finished Satin Nickel (SN)', 'Satin Chrome (SC)'],
+]
+
+SAMPLE_ROWS = [
+    ['Handle', 'Title', 'Option1 Name', 'Option1 Value', 'Variant SKU', 'Variant Price', 'Image Src'],
+    ['sample', 'Sample', 'Size', '150mm', 'S1', 1.0, 'https://example.com/sample.jpg'],
+]
+
+def write_workbook(path, sheets):
+    """Write a workbook with one sheet per entry of sheets, each a list of rows"""
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for sheet_name, rows in sheets.items():
+        worksheet = workbook.create_sheet(sheet_name)
+        for row in rows:
+            worksheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+@pytest.fixture
+def workbook_file(tmp_path):
+    """A small source workbook with the sheets the generator needs"""
+    return write_workbook(tmp_path / 'workbook.xlsx', {
+        'MASTER COPY': MASTER_COPY_ROWS,
+        'Sample': SAMPLE_ROWS,
+        'Finishes': FINISHES_ROWS,
+    })
+
+@pytest.fixture(autouse=True)
+def sheet_cache(tmp_path, monkeypatch):
+    """Keep the sheet cache and reader settings private to each test"""
+    cache_dir = tmp_path / 'sheet_cache'
+    monkeypatch.setitem(workbook_loader.CACHE_CONFIG, "enabled", True)
+    monkeypatch.setitem(workbook_loader.CACHE_CONFIG, "cache_dir", str(cache_dir))
+    monkeypatch.setitem(workbook_loader.READER_CONFIG, "backend", "openpyxl")
+    monkeypatch.setattr(workbook_loader, "_WORKBOOK_DIGESTS", {})
+    return cache_dir
+
+SAMPLE_WORKBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'SAMPLE_MASTER_COPY.xlsx')
+
+@pytest.fixture
+def sample_sheets():
+    """The sheets of SAMPLE_MASTER_COPY.xlsx as DataFrames, with tags in column K"""
+    sheets = pd.read_excel(SAMPLE_WORKBOOK, sheet_name=None)
+    sheets['MASTER COPY'][workbook_loader.COLUMN_K] = 'Levers, Handles'
+    return sheets
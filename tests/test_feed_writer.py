@@ -0,0 +1,65 @@
+"""
+Tests for FeedWriter: TRUE/FALSE text cells, formulas kept as text and missing values
+"""
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+from feed_writer import FeedWriter, cell_value, is_boolean_column
+
+COLUMNS = ['Handle', 'Published', 'Included / UK', 'Variant Price', 'Body (HTML)']
+
+def _saved_cells(path):
+    sheet = openpyxl.load_workbook(path).active
+    return [[(cell.value, cell.data_type) for cell in row] for row in sheet.iter_rows()]
+
+def test_boolean_columns():
+    assert is_boolean_column('Variant Taxable')
+    assert is_boolean_column('Included / Europe')
+    assert not is_boolean_column('Variant Price')
+
+@pytest.mark.parametrize('value', [None, np.nan, np.float64('nan'), pd.NA, pd.NaT, np.datetime64('NaT')])
+def test_missing_values_are_empty(value):
+    assert cell_value(value) is None
+
+def test_numpy_scalars_are_unwrapped():
+    assert type(cell_value(np.int64(3))) is int
+    assert cell_value(np.bool_(True)) is True
+    assert cell_value("TRUE") == "TRUE"
+
+def test_write_rows_keeps_true_false_as_text(tmp_path):
+    path = tmp_path / 'feed.xlsx'
+    with FeedWriter(path, COLUMNS) as writer:
+        writer.write_rows([
+            {'Handle': 'lever', 'Published': True, 'Included / UK': "FALSE", 'Variant Price': 25.5},
+            {'Handle': 'lever', 'Published': pd.NA, 'Variant Price': np.float64(28.5)},
+        ])
+    assert writer.rows_written == 2
+    header, first, second = _saved_cells(path)
+    assert [value for value, _ in header] == COLUMNS
+    assert first == [('lever', 's'), ('TRUE', 's'), ('FALSE', 's'), (25.5, 'n'), (None, 'n')]
+    assert [value for value, _ in second] == ['lever', None, None, 28.5, None]
+
+def test_text_columns_never_hold_formulas(tmp_path):
+    path = tmp_path / 'feed.xlsx'
+    with FeedWriter(path, COLUMNS, text_columns=['Body (HTML)']) as writer:
+        writer.write_rows([{'Handle': 'lever', 'Published': True, 'Body (HTML)': "=SUM(A1)"}])
+    row = _saved_cells(path)[1]
+    assert row[1] == (True, 'b')
+    assert row[4] == ('=SUM(A1)', 's')
+
+def test_write_frame_matches_write_rows(tmp_path):
+    df = pd.DataFrame({
+        'Handle': ['lever', 'knob'],
+        'Published': ["TRUE", None],
+        'Included / UK': [False, np.nan],
+        'Variant Price': [25.5, pd.NA],
+        'Body (HTML)': ["=1+1", pd.NaT],
+    }, columns=COLUMNS, dtype=object)
+    with FeedWriter(tmp_path / 'frame.xlsx', df.columns) as writer:
+        writer.write_frame(df)
+    with FeedWriter(tmp_path / 'rows.xlsx', df.columns) as writer:
+        writer.write_rows(df.to_dict('records'))
+    assert _saved_cells(tmp_path / 'frame.xlsx') == _saved_cells(tmp_path / 'rows.xlsx')
+    assert _saved_cells(tmp_path / 'frame.xlsx')[1][2] == ('FALSE', 's')
+    assert [value for value, _ in _saved_cells(tmp_path / 'frame.xlsx')[2]] == ['knob', None, None, None, None]
@@ -0,0 +1,73 @@
+"""
+Tests for FinishCatalog: finish codes, resolution order and get_finishes_for_product
+"""
+import pandas as pd
+import pytest
+import shopify_feed_generator as generator
+from finish_catalog import FinishCatalog
+
+ALL_FINISHES = ['Polished Nickel (PN)', 'Satin Nickel (SN)', 'Pewter (PEW)', 'Matt Black (MBL)', 'Chrome (CHR)']
+
+def _finishes_df():
+    return pd.DataFrame({
+        'Bjorn finishes': ['Chrome (CHR)', None, None, None, None],
+        2: ['Polished Nickel (PN)', 'Pewter (PEW)', None, None, None],
+        '3 (no codes)': ['Nickel', 'Black', 'Chrome', None, None],
+        25: ALL_FINISHES,
+    })
+
+def test_codes_and_categories():
+    catalog = FinishCatalog(_finishes_df())
+    assert catalog.code_to_name['MBL'] == 'Matt Black (MBL)'
+    assert catalog.name_to_code['Chrome (CHR)'] == 'CHR'
+    assert catalog.hash_finishes == ('Polished Nickel (PN)', 'Satin Nickel (SN)')
+    assert catalog.xhash_finishes == ('Pewter (PEW)', 'Matt Black (MBL)')
+    assert catalog.category_by_name['Pewter (PEW)'] == 'X##'
+    assert tuple(catalog.default_finishes) == tuple(ALL_FINISHES)
+
+@pytest.mark.parametrize('keyword, finish_count, finish_code, source, finishes', [
+    ('Bjorn', 2, '##', 'keyword', ('Chrome (CHR)',)),
+    (None, 2, '##', 'count', ('Polished Nickel (PN)', 'Pewter (PEW)')),
+    (None, None, '##', '##', ('Polished Nickel (PN)', 'Satin Nickel (SN)')),
+    (None, None, 'x##', 'x##', ('Pewter (PEW)', 'Matt Black (MBL)')),
+    (None, None, 'SN', 'code', ('Satin Nickel (SN)',)),
+    (None, None, 'ZZ', 'default', tuple(ALL_FINISHES)),
+])
+def test_resolve_finishes_order(keyword, finish_count, finish_code, source, finishes):
+    catalog = FinishCatalog(_finishes_df())
+    resolved = catalog.resolve_finishes(keyword, finish_count, finish_code)
+    assert resolved[:2] == (source, finishes)
+    assert catalog.finishes_in(resolved[2]) == sorted(finishes, key=catalog.finish_names.index)
+
+def test_finishes_for_product_columns():
+    catalog = FinishCatalog(_finishes_df())
+    assert catalog.finishes_for_product('Bjorn', None) == ('Chrome (CHR)',)
+    assert catalog.finishes_for_product(None, 3.0) == ('Nickel', 'Black', 'Chrome')
+    # No keyword or count column: the first column listing fewer than 25 coded finishes
+    assert catalog.finishes_for_product(None, None) == ('Chrome (CHR)',)
+    assert catalog.finishes_for_count('2') == ('Polished Nickel (PN)', 'Pewter (PEW)')
+    assert catalog.finishes_for_count(float('nan')) is None
+
+def test_keyword_columns_come_from_column_info():
+    catalog = FinishCatalog(_finishes_df(), keywords=['Bjorn'])
+    assert [col for col, info in catalog.column_info.items() if info['keyword_column']] == ['Bjorn finishes']
+    assert catalog.finishes_for_product('Bjorn', None) == ('Chrome (CHR)',)
+    # A keyword the catalog was not built with is still found by its header
+    assert catalog.finishes_for_product('NO CODES', None) == ('Nickel', 'Black', 'Chrome')
+
+def test_get_finishes_for_product_takes_the_catalog():
+    finishes_df = _finishes_df()
+    catalog = FinishCatalog(finishes_df)
+    for description, finish_count in [("Bjorn Lever on Rose", None), ("Plain Knob", 3), ("Plain Knob", None)]:
+        expected = generator.get_finishes_for_product(description, finish_count, catalog)
+        assert generator.get_finishes_for_product(description, finish_count, finishes_df) == expected
+    assert generator.get_finishes_for_product("Bjorn Lever on Rose", None, catalog) == ['Chrome (CHR)']
+
+def test_catalogs_answer_from_their_own_sheet():
+    other_df = pd.DataFrame({'Bjorn range': ['Satin Nickel (SN)', 'Pewter (PEW)'], 3: ['Bronze (BZ)', None], 25: ['Bronze (BZ)', 'Pewter (PEW)']})
+    catalog, other_catalog = FinishCatalog(_finishes_df()), FinishCatalog(other_df)
+    for _ in range(2):
+        assert generator.get_finishes_for_product("Bjorn Lever", None, catalog) == ['Chrome (CHR)']
+        assert generator.get_finishes_for_product("Bjorn Lever", None, other_catalog) == ['Satin Nickel (SN)', 'Pewter (PEW)']
+        assert generator.get_finishes_for_product("Plain Knob", 3, catalog) == ['Nickel', 'Black', 'Chrome']
+        assert generator.get_finishes_for_product("Plain Knob", 3, other_catalog) == ['Bronze (BZ)']
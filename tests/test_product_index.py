@@ -0,0 +1,54 @@
+"""
+Tests for ProductIndex: products found in an Excel row range match the products of that range read on its own
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from product_index import ProductIndex, find_product_groups, iter_product_groups
+
+DESCRIPTIONS = ['Lever', None, 'Lever', 'Knob', None, 'Knob', None, 'Pull', 'Pull', 'Lever', None]
+
+def _master_copy(descriptions=DESCRIPTIONS):
+    return pd.DataFrame({'description': descriptions, 'code': [str(1000 + number) for number in range(len(descriptions))]})
+
+def _window_products(df, start_row, end_row, row_offset=2):
+    """The products find_product_groups finds in just the rows start_row..end_row"""
+    rows = np.asarray(df.index) + row_offset
+    window = df[(rows >= start_row) & (rows <= end_row)]
+    return [(description, (window.index[start:stop] + row_offset).tolist()) for description, start, stop in find_product_groups(window)]
+
+def test_find_product_groups():
+    assert find_product_groups(_master_copy()) == [('Lever', 0, 3), ('Knob', 3, 7), ('Pull', 7, 9), ('Lever', 9, 11)]
+    assert find_product_groups(_master_copy([None, 'Knob', None])) == [('Knob', 1, 3)]
+    assert find_product_groups(_master_copy([])) == []
+
+def test_products_cover_the_sheet_by_excel_row():
+    index = ProductIndex(_master_copy())
+    assert len(index) == 4
+    assert index.start_rows == [2, 5, 9, 11]
+    assert [(description, rows['code'].tolist()) for description, rows in index.products()][1] == ('Knob', ['1003', '1004', '1005', '1006'])
+
+@pytest.mark.parametrize('dropped', [[], [2, 8], [0, 4, 5]])
+def test_ranges_match_reading_only_the_range(dropped):
+    df = _master_copy().drop(index=dropped)
+    index = ProductIndex(df)
+    for start_row in range(1, 14):
+        for end_row in range(start_row, 14):
+            expected = _window_products(df, start_row, end_row)
+            assert list(index.rows_in_range(start_row, end_row)) == expected
+            found = [(description, (rows.index + 2).tolist()) for description, rows in index.products_in_range(start_row, end_row)]
+            assert found == expected
+
+def test_window_frames_use_their_own_row_numbers():
+    # read_sheet_window frames are already indexed by Excel row
+    window = _master_copy().iloc[3:8].set_axis(range(5, 10))
+    index = ProductIndex(window, row_offset=0)
+    assert list(index.rows_in_range(5, 9)) == [('Knob', [5, 6, 7, 8]), ('Pull', [9])]
+    assert list(index.rows_in_range(7, 8)) == [('Knob', [7, 8])]
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 11])
+def test_iter_product_groups_joins_products_across_chunks(chunk_size):
+    df = _master_copy()
+    chunks = (df.iloc[start:start + chunk_size] for start in range(0, len(df), chunk_size))
+    grouped = [(description, rows.index.tolist()) for description, rows in iter_product_groups(chunks)]
+    assert grouped == [(description, df.index[start:stop].tolist()) for description, start, stop in find_product_groups(df)]
@@ -0,0 +1,31 @@
+"""
+Tests for generate_shopify_feed and the helpers it builds the feed with
+"""
+import contextlib
+import io
+import pandas as pd
+import shopify_feed_generator as generator
+
+def _generate(sheets, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return generator.generate_shopify_feed(sheets, save_reports=False, **kwargs)
+
+def test_columns_missing_from_the_template_keep_their_order(sample_sheets):
+    sample_sheets['Sample'] = pd.DataFrame(columns=['Handle', 'Title'])
+    feed = _generate(sample_sheets)[0]
+    assert list(feed.columns) == [
+        'Handle', 'Title', 'Image Alt Text', 'Vendor', 'Product Category', 'Type', 'Published',
+        'Option1 Name', 'Option2 Name', 'Image Position', 'Gift Card', 'SEO Title', 'Tags',
+        'Included / United Kingdom', 'Included / Australia', 'Included / Canada', 'Included / Europe',
+        'Included / International', 'Included / United States', 'Status',
+        'Option1 Value', 'Option2 Value', 'Variant SKU', 'Variant Grams', 'Variant Inventory Tracker',
+        'Variant Inventory Qty', 'Variant Inventory Policy', 'Variant Fulfillment Service', 'Variant Price',
+        'Variant Requires Shipping', 'Variant Taxable', 'Variant Weight Unit']
+
+def test_stream_writes_the_same_feed(sample_sheets, tmp_path):
+    sample_sheets['Sample'] = pd.DataFrame(columns=['Handle', 'Title'])
+    saved, streamed = tmp_path / 'feed.xlsx', tmp_path / 'streamed.xlsx'
+    feed = _generate(sample_sheets, output_file=str(saved))[0]
+    rows_written = _generate(sample_sheets, output_file=str(streamed), stream=True)[0]
+    assert rows_written == len(feed)
+    pd.testing.assert_frame_equal(pd.read_excel(streamed), pd.read_excel(saved))
@@ -0,0 +1,54 @@
+"""
+Tests for VariantTable: row order, feed columns and the DataFrame it builds
+"""
+import pandas as pd
+from variant_table import VariantTable
+
+CONSTANTS = {'Variant Grams': 0, 'Variant Taxable': "TRUE", 'Variant Weight Unit': "kg"}
+VARIANT_ORDER = ('Option1 Value', 'Option2 Value', 'Variant SKU', 'Variant Grams', 'Variant Price',
+                 'Variant Taxable', 'Variant Weight Unit')
+
+def _table(columns=('Handle', 'Title')):
+    table = VariantTable(columns, CONSTANTS, VARIANT_ORDER)
+    sized = table.add_product('lever', {'Title': "Lever", 'Tags': "Levers"}, True)
+    table.add_variant(sized, '150mm', 'Polished Brass (PB)', '1001/1', 25.5)
+    table.add_variant(sized, '200mm', 'Polished Brass (PB)', '1001/2', 28.5)
+    unsized = table.add_product('knob', {'Title': "Knob", 'Tags': "Knobs"}, False)
+    table.add_variant(unsized, None, 'Satin Chrome (SC)', '2001', 15.5)
+    return table
+
+def test_feed_columns_follow_the_variant_order():
+    assert _table().feed_columns() == ['Handle', 'Title', 'Tags', *VARIANT_ORDER]
+
+def test_feed_columns_known_before_variants_are_added():
+    table = VariantTable(['Handle', 'Variant SKU'], CONSTANTS, VARIANT_ORDER, ['Title', 'Tags'])
+    expected = ['Handle', 'Variant SKU', 'Title', 'Tags', 'Option1 Value', 'Option2 Value', 'Variant Grams',
+                'Variant Price', 'Variant Taxable', 'Variant Weight Unit']
+    assert table.feed_columns() == expected
+    unsized = table.add_product('knob', {'Title': "Knob", 'Tags': "Knobs"}, False)
+    table.add_variant(unsized, None, 'Satin Chrome (SC)', '2001', 15.5)
+    assert table.feed_columns() == expected
+    assert list(table.to_frame().columns) == expected
+
+def test_rows_set_only_their_own_product_fields():
+    rows = list(_table().rows())
+    assert [row['Title'] for row in rows] == ["Lever", None, "Knob"]
+    assert [row['Option1 Value'] for row in rows] == ['150mm', '200mm', 'Satin Chrome (SC)']
+    assert 'Option2 Value' not in rows[2]
+    assert list(rows[0]) == _table().feed_columns()
+
+def test_to_frame_matches_rows():
+    table = _table()
+    columns = table.feed_columns()
+    expected = pd.DataFrame(list(table.rows()), columns=columns, dtype=object)
+    frame = table.to_frame()
+    assert list(frame.columns) == columns
+    pd.testing.assert_frame_equal(frame.fillna(pd.NA), expected.fillna(pd.NA))
+
+def test_clear_keeps_columns_and_constants():
+    table = _table()
+    table.clear()
+    assert len(table) == 0
+    assert list(table.rows()) == []
+    assert table.to_frame().columns.tolist() == ['Handle', 'Title', *VARIANT_ORDER]
+    assert table.constants == CONSTANTS
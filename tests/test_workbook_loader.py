@@ -0,0 +1,149 @@
+"""
+Tests for workbook_loader: the parsed-sheet cache, row windows and the reader backends
+"""
+import datetime as dt
+import os
+import pandas as pd
+import pytest
+import workbook_loader
+from conftest import MASTER_COPY_ROWS, write_workbook
+
+def _cached_files(cache_dir):
+    return sorted(name for _, _, files in os.walk(cache_dir) for name in files)
+
+def test_cache_hit_returns_the_parsed_sheets(workbook_file, sheet_cache):
+    parsed, load_times = workbook_loader.load_workbook_sheets(workbook_file)
+    assert not any(key.endswith('(cached)') for key in load_times)
+
+    cached, load_times = workbook_loader.load_workbook_sheets(workbook_file)
+    assert {'MASTER COPY (cached)', 'Sample (cached)', 'Finishes (cached)'} <= set(load_times)
+    for sheet_name, df in parsed.items():
+        pd.testing.assert_frame_equal(cached[sheet_name], df, check_exact=True)
+
+def test_cache_is_stored_as_parquet(workbook_file, sheet_cache):
+    workbook_loader.load_workbook_sheets(workbook_file)
+    files = _cached_files(sheet_cache)
+    assert files
+    assert all(name.endswith('.parquet') or name == 'meta.json' for name in files)
+
+def test_cache_invalidated_when_the_workbook_changes(tmp_path, sheet_cache):
+    path = write_workbook(tmp_path / 'workbook.xlsx', {'MASTER COPY': MASTER_COPY_ROWS})
+    workbook_loader.load_workbook_sheets(path, ['MASTER COPY'])
+
+    changed = [row[:] for row in MASTER_COPY_ROWS]
+    changed[1][3] = 99.0
+    write_workbook(path, {'MASTER COPY': changed})
+    sheets, load_times = workbook_loader.load_workbook_sheets(path, ['MASTER COPY'])
+    assert 'MASTER COPY (cached)' not in load_times
+    assert sheets['MASTER COPY'].loc[0, 'rrp'] == 99.0
+
+def test_cache_keeps_value_types(tmp_path, sheet_cache):
+    rows = [['description', 'size', 'code', 'rrp', 'finish', 'finish count'],
+            ['Knob', 25, 'K1', 1.5, '##', 8],
+            ['Knob', 'Large', 1234, 2.5, '##', 8],
+            ['Knob', dt.datetime(2024, 1, 2, 3, 4), 'K3', 3.5, '##', 8],
+            ['Knob', True, 'K4', 4.5, '##', 8],
+            ['Knob', None, 'K5', None, '##', 8]]
+    path = write_workbook(tmp_path / 'workbook.xlsx', {'MASTER COPY': rows})
+    parsed, _ = workbook_loader.load_workbook_sheets(path, ['MASTER COPY'])
+    cached, load_times = workbook_loader.load_workbook_sheets(path, ['MASTER COPY'])
+    assert 'MASTER COPY (cached)' in load_times
+    pd.testing.assert_frame_equal(cached['MASTER COPY'], parsed['MASTER COPY'], check_exact=True)
+    for before, after in zip(parsed['MASTER COPY']['size'], cached['MASTER COPY']['size']):
+        assert type(after) is type(before)
+
+def test_in_memory_workbooks_cached_only_when_asked(workbook_file, sheet_cache):
+    data = open(workbook_file, 'rb').read()
+    workbook_loader.load_workbook_sheets(data)
+    assert not _cached_files(sheet_cache)
+
+    parsed, _ = workbook_loader.load_workbook_sheets(data, use_cache=True)
+    assert workbook_loader.get_sheet_max_row(data, 'MASTER COPY', use_cache=True) == len(MASTER_COPY_ROWS)
+    # A new session uploading the same bytes, or opening the same file, reads the cache
+    cached, load_times = workbook_loader.load_workbook_sheets(bytes(data), use_cache=True)
+    assert 'MASTER COPY (cached)' in load_times
+    pd.testing.assert_frame_equal(cached['MASTER COPY'], parsed['MASTER COPY'], check_exact=True)
+    _, load_times = workbook_loader.load_workbook_sheets(workbook_file)
+    assert 'MASTER COPY (cached)' in load_times
+
+def test_fresh_parse_probes_only_master_copy(workbook_file, sheet_cache, monkeypatch):
+    probed = []
+    probe_sheet_max_row = workbook_loader.probe_sheet_max_row
+    monkeypatch.setattr(workbook_loader, "probe_sheet_max_row",
+                        lambda excel_file, sheet_name: probed.append(sheet_name) or probe_sheet_max_row(excel_file, sheet_name))
+    workbook_loader.load_workbook_sheets(workbook_file)
+    assert probed == ['MASTER COPY']
+    assert workbook_loader.get_sheet_max_row(workbook_file, 'MASTER COPY') == len(MASTER_COPY_ROWS)
+    assert probed == ['MASTER COPY']
+
+def test_clear_cache_empties_the_cache_dir(workbook_file, sheet_cache):
+    workbook_loader.load_workbook_sheets(workbook_file)
+    assert _cached_files(sheet_cache)
+    workbook_loader.clear_cache()
+    assert not _cached_files(sheet_cache)
+    _, load_times = workbook_loader.load_workbook_sheets(workbook_file)
+    assert not any(key.endswith('(cached)') for key in load_times)
+
+def test_cache_skipped_without_pyarrow(workbook_file, sheet_cache, monkeypatch):
+    monkeypatch.setattr(workbook_loader, "cache_available", lambda: False)
+    workbook_loader.load_workbook_sheets(workbook_file)
+    _, load_times = workbook_loader.load_workbook_sheets(workbook_file)
+    assert not any(key.endswith('(cached)') for key in load_times)
+    assert not _cached_files(sheet_cache)
+
+def test_workbook_hashed_once_per_run(workbook_file, monkeypatch):
+    calls = []
+    hash_workbook = workbook_loader.hash_workbook
+    monkeypatch.setattr(workbook_loader, "hash_workbook", lambda path: calls.append(path) or hash_workbook(path))
+
+    workbook_loader.get_sheet_max_row(workbook_file, 'MASTER COPY')
+    workbook_loader.read_sheet_window(workbook_file, 'MASTER COPY', 2, 3)
+    workbook_loader.load_workbook_sheets(workbook_file)
+    workbook_loader.read_sheet_window(workbook_file, 'MASTER COPY', 2, 3)
+    assert len(calls) == 1
+
+def test_window_is_indexed_by_excel_row(workbook_file):
+    full = workbook_loader.load_workbook_sheets(workbook_file, ['MASTER COPY'], use_cache=False)[0]['MASTER COPY']
+    window = workbook_loader.read_sheet_window(workbook_file, 'MASTER COPY', 3, 4)
+    assert list(window.index) == [3, 4]
+    # Excel row 3 is the second data row, index 1 of a full parse
+    assert list(window['code']) == list(full.loc[1:2, 'code'])
+
+def test_window_starts_below_the_header(workbook_file):
+    window = workbook_loader.read_sheet_window(workbook_file, 'MASTER COPY', 1, 2)
+    assert list(window.index) == [2]
+    assert window.loc[2, 'code'] == 'SMP001/1'
+
+def test_window_past_the_last_row(workbook_file):
+    window = workbook_loader.read_sheet_window(workbook_file, 'MASTER COPY', 5, 50)
+    assert list(window.index) == [5]
+    assert workbook_loader.read_sheet_window(workbook_file, 'MASTER COPY', 6, 50).empty
+
+def test_window_from_cache_matches_workbook(workbook_file):
+    uncached = workbook_loader.read_sheet_window(workbook_file, 'MASTER COPY', 2, 4)
+    workbook_loader.load_workbook_sheets(workbook_file)
+    cached = workbook_loader.read_sheet_window(workbook_file, 'MASTER COPY', 2, 4)
+    pd.testing.assert_frame_equal(cached, uncached, check_index_type=False)
+
+def _blank_column_k_workbook(tmp_path):
+    """MASTER COPY with tags in column K under a blank K1, and nothing else past column F"""
+    rows = [row[:] for row in MASTER_COPY_ROWS]
+    for row in rows[1:]:
+        row.extend([None] * 4 + ['Levers, Handles'])
+    return write_workbook(tmp_path / 'blank_k.xlsx', {'MASTER COPY': rows})
+
+@pytest.mark.parametrize('backend', ['openpyxl', 'xml'])
+def test_column_k_read_under_a_blank_header(tmp_path, monkeypatch, backend):
+    monkeypatch.setitem(workbook_loader.READER_CONFIG, "backend", backend)
+    path = _blank_column_k_workbook(tmp_path)
+
+    parsed = workbook_loader.load_workbook_sheets(path, ['MASTER COPY'], use_cache=False)[0]['MASTER COPY']
+    assert list(parsed[workbook_loader.COLUMN_K]) == ['Levers, Handles'] * 4
+    window = workbook_loader.read_sheet_window(path, 'MASTER COPY', 2, 3)
+    assert list(window[workbook_loader.COLUMN_K]) == ['Levers, Handles'] * 2
+    chunks = list(workbook_loader.iter_sheet_chunks(path, 'MASTER COPY', chunk_rows=3))
+    assert list(pd.concat(chunks)[workbook_loader.COLUMN_K]) == ['Levers, Handles'] * 4
+
+def test_column_k_empty_when_the_sheet_is_narrower(workbook_file):
+    parsed = workbook_loader.load_workbook_sheets(workbook_file, ['MASTER COPY'], use_cache=False)[0]['MASTER COPY']
+    assert parsed[workbook_loader.COLUMN_K].isna().all()
@@ -0,0 +1,148 @@
+"""
+Parity tests for the xml reader backend: every sheet it parses must match pandas' openpyxl engine
+"""
+import zipfile
+import pandas as pd
+import pytest
+import workbook_loader
+
+MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+RELATIONSHIPS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE = 'http://schemas.openxmlformats.org/package/2006/relationships'
+TYPES = 'application/vnd.openxmlformats-officedocument.spreadsheetml'
+
+# Style 1 is the built-in date format, 2 a custom date-time format and 3 a duration format
+STYLES = (
+    f'<styleSheet xmlns="{MAIN}">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm"/><numFmt numFmtId="165" formatCode="[h]:mm:ss"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0"/><xf numFmtId="14" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" applyNumberFormat="1"/><xf numFmtId="165" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+# Shared strings 6 and 7 are a rich-text run with a phonetic hint and text with surrounding spaces
+SHARED_STRINGS = (
+    '<si><t>description</t></si><si><t>size</t></si><si><t>code</t></si><si><t>rrp</t></si>'
+    '<si><t>finish</t></si><si><t>finish count</t></si>'
+    '<si><r><t xml:space="preserve">Rich </t></r><r><rPr><b/></rPr><t>lever</t></r><rPh sb="0" eb="1"><t>hint</t></rPh></si>'
+    '<si><t xml:space="preserve"> padded </t></si><si><t>when</t></si><si><t>flag</t></si><si><t></t></si>'
+)
+
+# Dates, shared and inline strings, formulas with and without cached values, and cells
+# scattered past the header, including column K under a blank header cell
+MASTER_COPY_XML = (
+    '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c><c r="C1" t="s"><v>2</v></c>'
+    '<c r="D1" t="s"><v>3</v></c><c r="E1" t="s"><v>4</v></c><c r="F1" t="s"><v>5</v></c></row>'
+    '<row r="2"><c r="A2" t="s"><v>6</v></c><c r="B2" s="1"><v>45293</v></c><c r="C2"><v>1001</v></c>'
+    '<c r="D2"><v>12.5</v></c><c r="E2" t="inlineStr"><is><t>##</t></is></c><c r="F2"><v>14</v></c>'
+    '<c r="K2" t="inlineStr"><is><t>Levers</t></is></c></row>'
+    '<row r="3"><c r="A3" t="s"><v>6</v></c><c r="B3" t="s"><v>7</v></c><c r="C3" t="inlineStr"><is><t>00123</t></is></c>'
+    '<c r="D3"><f>10+2.5</f></c><c r="G3" t="b"><v>1</v></c><c r="M3"><v>9</v></c></row>'
+    '<row r="5"><c r="A5" t="s"><v>6</v></c><c r="C5"><v>1002.5</v></c><c r="D5" t="str"><f>"12"</f><v>12</v></c>'
+    '<c r="K5" t="s"><v>6</v></c></row>'
+    '<row r="6"><c r="G6"><v>1</v></c></row>'
+)
+
+# Booleans, date-times, durations, errors, rich inline strings, cells without a reference,
+# a missing row and a trailing row holding only an empty string
+OTHER_XML = (
+    '<row r="1"><c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>8</v></c><c r="C1" t="s"><v>9</v></c>'
+    '<c r="E1" t="inlineStr"><is><t>inline</t></is></c></row>'
+    '<row r="2"><c r="A2" t="s"><v>6</v></c><c r="B2" s="1"><v>45293</v></c><c r="C2" t="b"><v>1</v></c>'
+    '<c r="E2" t="inlineStr"><is><r><t>in</t></r><r><t>line</t></r></is></c></row>'
+    '<row r="3"><c r="A3" t="s"><v>7</v></c><c r="B3" s="2"><v>45293.5</v></c><c r="C3" t="b"><v>0</v></c>'
+    '<c r="D3"><f>1+1</f></c><c r="E3" t="str"><f>"a"&amp;"b"</f><v>ab</v></c></row>'
+    '<row r="5"><c r="A5"><v>3</v></c><c r="B5" s="3"><v>1.25</v></c><c r="C5" t="e"><v>#N/A</v></c>'
+    '<c r="D5"><f>2+2</f><v>4</v></c><c r="H5"><v>2.5</v></c></row>'
+    '<row r="6"><c><v>7</v></c><c t="s"><v>6</v></c></row>'
+    '<row r="7"><c r="A7" t="s"><v>10</v></c></row>'
+)
+
+def write_xlsx(path, sheets, shared_strings):
+    """Write an xlsx archive by hand, so the sheet XML holds exactly the cells given"""
+    count = len(sheets)
+    parts = {
+        '[Content_Types].xml': (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            f'<Override PartName="/xl/workbook.xml" ContentType="{TYPES}.sheet.main+xml"/>'
+            + ''.join(f'<Override PartName="/xl/worksheets/sheet{n}.xml" ContentType="{TYPES}.worksheet+xml"/>' for n in range(1, count + 1))
+            + f'<Override PartName="/xl/sharedStrings.xml" ContentType="{TYPES}.sharedStrings+xml"/>'
+            f'<Override PartName="/xl/styles.xml" ContentType="{TYPES}.styles+xml"/></Types>'
+        ),
+        '_rels/.rels': (
+            f'<Relationships xmlns="{PACKAGE}">'
+            f'<Relationship Id="rId1" Type="{RELATIONSHIPS}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+        ),
+        'xl/workbook.xml': (
+            f'<workbook xmlns="{MAIN}" xmlns:r="{RELATIONSHIPS}"><sheets>'
+            + ''.join(f'<sheet name="{name}" sheetId="{n}" r:id="rId{n}"/>' for n, name in enumerate(sheets, 1))
+            + '</sheets></workbook>'
+        ),
+        'xl/_rels/workbook.xml.rels': (
+            f'<Relationships xmlns="{PACKAGE}">'
+            + ''.join(f'<Relationship Id="rId{n}" Type="{RELATIONSHIPS}/worksheet" Target="worksheets/sheet{n}.xml"/>'
+                      for n in range(1, count + 1))
+            + f'<Relationship Id="rIdStrings" Type="{RELATIONSHIPS}/sharedStrings" Target="sharedStrings.xml"/>'
+            f'<Relationship Id="rIdStyles" Type="{RELATIONSHIPS}/styles" Target="styles.xml"/></Relationships>'
+        ),
+        'xl/sharedStrings.xml': f'<sst xmlns="{MAIN}">{shared_strings}</sst>',
+        'xl/styles.xml': STYLES,
+    }
+    for n, rows in enumerate(sheets.values(), 1):
+        parts[f'xl/worksheets/sheet{n}.xml'] = f'<worksheet xmlns="{MAIN}"><sheetData>{rows}</sheetData></worksheet>'
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+    return str(path)
+
+@pytest.fixture
+def parity_workbook(tmp_path):
+    return write_xlsx(tmp_path / 'parity.xlsx', {'MASTER COPY': MASTER_COPY_XML, 'Other': OTHER_XML}, SHARED_STRINGS)
+
+def _load(path, backend, monkeypatch):
+    monkeypatch.setitem(workbook_loader.READER_CONFIG, "backend", backend)
+    return workbook_loader.load_workbook_sheets(path, ['MASTER COPY', 'Other'], use_cache=False)[0]
+
+@pytest.mark.parametrize('sheet_name', ['MASTER COPY', 'Other'])
+def test_xml_backend_matches_openpyxl(parity_workbook, monkeypatch, sheet_name):
+    expected = _load(parity_workbook, 'openpyxl', monkeypatch)[sheet_name]
+    parsed = _load(parity_workbook, 'xml', monkeypatch)[sheet_name]
+    pd.testing.assert_frame_equal(parsed, expected)
+
+def test_xml_values_keep_their_types(parity_workbook, monkeypatch):
+    other = _load(parity_workbook, 'xml', monkeypatch)['Other']
+    assert other.loc[0, 'description'] == 'Rich lever'
+    assert other.loc[1, 'description'] == ' padded '
+    assert other.loc[0, 'when'] == pd.Timestamp(2024, 1, 2)
+    assert other.loc[1, 'when'] == pd.Timestamp(2024, 1, 2, 12)
+    assert other.loc[3, 'when'] == pd.Timedelta(hours=30)
+    assert other.loc[0, 'inline'] == 'inline'
+    assert other.loc[1, 'inline'] == 'ab'
+    # A formula saved without a cached value reads as an empty cell
+    assert pd.isna(other.loc[1, 'Unnamed: 3'])
+    assert other.loc[3, 'Unnamed: 3'] == 4
+    assert other.loc[4, 'description'] == 7 and other.loc[4, 'when'] == 'Rich lever'
+    assert len(other) == 5
+
+@pytest.mark.parametrize('sheet_name', ['MASTER COPY', 'Other'])
+def test_xml_chunks_match_openpyxl_chunks(parity_workbook, monkeypatch, sheet_name):
+    chunks = {}
+    for backend in ('openpyxl', 'xml'):
+        monkeypatch.setitem(workbook_loader.READER_CONFIG, "backend", backend)
+        chunks[backend] = list(workbook_loader.iter_sheet_chunks(parity_workbook, sheet_name, chunk_rows=2))
+    assert len(chunks['xml']) == len(chunks['openpyxl'])
+    for parsed, expected in zip(chunks['xml'], chunks['openpyxl']):
+        pd.testing.assert_frame_equal(parsed, expected)
+
+def test_window_matches_a_full_parse(parity_workbook, monkeypatch):
+    expected = _load(parity_workbook, 'openpyxl', monkeypatch)['MASTER COPY']
+    expected.index = expected.index + workbook_loader.FIRST_DATA_ROW
+    window = workbook_loader.read_sheet_window(parity_workbook, 'MASTER COPY', 2, 5)
+    pd.testing.assert_frame_equal(window, expected.loc[2:5], check_dtype=False, check_index_type=False)
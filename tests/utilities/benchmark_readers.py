@@ -0,0 +1,109 @@
+"""
+Compare the workbook reader backends on a synthetic MASTER COPY sheet.
+
+Reports parse time and peak Python memory for each backend in workbook_loader.READER_BACKENDS,
+and checks that every backend loads the same data as the default openpyxl backend.
+
+Usage (from the project root):
+    python tests/utilities/benchmark_readers.py --rows 20000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import openpyxl
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from workbook_loader import load_workbook_sheets, READER_BACKENDS, READER_CONFIG
+
+FINISH_CODES = ['##', 'x##', 'CP', 'SCP', 'PB', 'PN', 'SN']
+
+def make_workbook(path, rows):
+    """Write a synthetic workbook with a MASTER COPY of the given number of rows"""
+    wb = openpyxl.Workbook(write_only=True)
+
+    master_copy = wb.create_sheet('MASTER COPY')
+    master_copy.append(['description', 'size', 'code', 'rrp', 'finish', 'finish count',
+                        'supplier', 'cost', 'weight', 'barcode', 'tags', 'notes'])
+    for i in range(rows):
+        # Products of five sizes, with only the first row of each carrying the description
+        product = i // 5
+        master_copy.append([
+            f"Benchmark Lever Handle {product}" if i % 5 == 0 else None,
+            f"{60 + (i % 5) * 10}mm",
+            100000 + i,
+            round(10 + (i % 37) * 1.25, 2),
+            FINISH_CODES[i % len(FINISH_CODES)],
+            None,
+            f"Supplier {i % 13}",
+            round(5 + (i % 17) * 0.5, 2),
+            i % 900,
+            f"50{i:011d}",
+            f"Benchmark Suite {product % 40} - Door Hardware" if i % 5 == 0 else None,
+            "Synthetic row for reader benchmarking"
+        ])
+
+    sample = wb.create_sheet('Sample')
+    sample.append(['Handle', 'Title', 'Image Src'])
+    sample.append(['example', 'Example', 'https://example.com/image.jpg'])
+
+    finishes = wb.create_sheet('Finishes')
+    finishes.append([25, 14, 8])
+    for i in range(25):
+        finishes.append([f"Finish {i} (F{i})", f"Finish {i} (F{i})" if i < 14 else None, f"Finish {i} (F{i})" if i < 8 else None])
+
+    wb.save(path)
+
+def measure(path, backend):
+    """Load all sheets with one backend, returning (sheets, seconds, peak MB).
+
+    Memory is traced in a second load, as tracing slows parsing down too much to time it.
+    """
+    READER_CONFIG["backend"] = backend
+    start = time.perf_counter()
+    sheets, _ = load_workbook_sheets(path, use_cache=False)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    try:
+        load_workbook_sheets(path, use_cache=False)
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+    return sheets, seconds, peak
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the workbook reader backends')
+    parser.add_argument('--rows', type=int, default=20000, help='Number of MASTER COPY rows to generate')
+    parser.add_argument('--input', help='Benchmark an existing workbook instead of a synthetic one')
+    args = parser.parse_args()
+
+    if args.input:
+        path = args.input
+    else:
+        path = os.path.join(tempfile.mkdtemp(), 'benchmark_master_copy.xlsx')
+        print(f"Writing synthetic workbook with {args.rows} MASTER COPY rows...")
+        make_workbook(path, args.rows)
+    print(f"Workbook size: {os.path.getsize(path) / (1024 * 1024):.1f} MB\n")
+
+    print(f"{'Backend':<10} {'Time (s)':>10} {'Peak memory (MB)':>18}  Matches openpyxl")
+    reference = None
+    for backend in READER_BACKENDS:
+        try:
+            sheets, seconds, peak = measure(path, backend)
+        except ImportError as e:
+            print(f"{backend:<10} {'-':>10} {'-':>18}  Not installed ({e})")
+            continue
+        if reference is None:
+            reference = sheets
+        matches = all(sheets[name].equals(reference[name]) for name in reference)
+        print(f"{backend:<10} {seconds:>10.2f} {peak:>18.1f}  {'Yes' if matches else 'NO'}")
+
+    if not args.input:
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
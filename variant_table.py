@@ -0,0 +1,154 @@
+"""
+Variant table for the Shopify Feed Generator
+Holds the feed as one array per variant field, with each product's first-row fields and
+the fields every variant shares stored once, and only expands it into feed rows when the
+feed is written.
+"""
+from array import array
+import numpy as np
+import pandas as pd
+
+# The columns holding each variant's own values
+VARIANT_COLUMNS = ('Option1 Value', 'Option2 Value', 'Variant SKU', 'Variant Price')
+# Without sizes the finish is Option1 and Option2 is left empty
+UNSIZED_VARIANT_COLUMNS = ('Option1 Value', 'Variant SKU', 'Variant Price')
+
+class VariantTable:
+    """The variants of a Shopify feed, stored column by column.
+
+    Each variant only records its product, size, finish, SKU and price; sizes and finishes
+    are numbered, so a value repeated across variants is stored once. Each product's handle,
+    the fields set on its first row and whether it has sizes are stored once per product,
+    and constants (the fields every variant row gets) once for the whole table.
+
+    The feed's columns are the template's, then any of Handle, product_columns (the columns
+    set on a product's first row, in order) and the variant row's columns the template lacks,
+    so they are known before any variant is added. variant_columns is the order of a variant
+    row's columns, VARIANT_COLUMNS and the constants together; by default it is
+    VARIANT_COLUMNS followed by the constants.
+    """
+
+    def __init__(self, columns, constants=None, variant_columns=VARIANT_COLUMNS, product_columns=()):
+        self.columns = list(columns)
+        self.constants = dict(constants or {})
+        self.product_columns = list(product_columns)
+        variant_columns = tuple(variant_columns)
+        variant_columns += tuple(col for col in (*VARIANT_COLUMNS, *self.constants) if col not in variant_columns)
+        # The columns a variant row sets, with and without sizes, in variant_columns order
+        self._row_columns = {
+            has_sizes: tuple(col for col in variant_columns if col in own_columns or col in self.constants)
+            for has_sizes, own_columns in ((True, VARIANT_COLUMNS), (False, UNSIZED_VARIANT_COLUMNS))
+        }
+        self.handles = []
+        self.product_fields = []
+        self.product_has_sizes = []
+        self.values = []
+        self._value_ids = {}
+        self.clear()
+
+    def clear(self):
+        """Drop every product and variant, keeping the columns and constants"""
+        self.handles.clear()
+        self.product_fields.clear()
+        self.product_has_sizes.clear()
+        self.values.clear()
+        self._value_ids.clear()
+        self.product_ids = array('l')
+        self.size_ids = array('l')
+        self.finish_ids = array('l')
+        self.skus = []
+        self.prices = array('d')
+
+    def __len__(self):
+        return len(self.skus)
+
+    def add_product(self, handle, fields, has_sizes):
+        """Add a product, returning its id; fields are the columns set on its first variant row only"""
+        self.handles.append(handle)
+        self.product_fields.append(fields)
+        self.product_has_sizes.append(has_sizes)
+        return len(self.handles) - 1
+
+    def add_variant(self, product_id, size, finish, sku, price):
+        """Add a variant of a product; size is None for products without sizes"""
+        self.product_ids.append(product_id)
+        self.size_ids.append(self._value_id(size))
+        self.finish_ids.append(self._value_id(finish))
+        self.skus.append(sku)
+        self.prices.append(price)
+
+    def _value_id(self, value):
+        """Number an option value, so each distinct value is only stored once"""
+        # Keyed by type as well, so 1 and 1.0 (or 1 and True) stay apart
+        key = (type(value), value)
+        value_id = self._value_ids.get(key)
+        if value_id is None:
+            value_id = self._value_ids[key] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def rows(self):
+        """Yield every variant as a feed row (a dict keyed by column name), in the order they were added"""
+        values = self.values
+        constants = self.constants
+        previous_product = None
+        for number, product_id in enumerate(self.product_ids):
+            row = dict.fromkeys(self.columns)
+            row['Handle'] = self.handles[product_id]
+            # A product's first variant carries its product-level fields
+            if product_id != previous_product:
+                row.update(self.product_fields[product_id])
+                previous_product = product_id
+            has_sizes = self.product_has_sizes[product_id]
+            if has_sizes:
+                own = {'Option1 Value': values[self.size_ids[number]], 'Option2 Value': values[self.finish_ids[number]]}
+            else:
+                own = {'Option1 Value': values[self.finish_ids[number]]}
+            own['Variant SKU'] = self.skus[number]
+            own['Variant Price'] = self.prices[number]
+            for col in self._row_columns[has_sizes]:
+                row[col] = own[col] if col in own else constants[col]
+            yield row
+
+    def feed_columns(self):
+        """Return the feed's columns: the template's, then the declared and product columns it lacks"""
+        # Product fields that were not declared follow the declared ones, in the order they were first set
+        product_columns = [col for product_id in dict.fromkeys(self.product_ids) for col in self.product_fields[product_id]]
+        return list(dict.fromkeys([*self.columns, 'Handle', *self.product_columns, *product_columns, *self._row_columns[True]]))
+
+    def to_frame(self):
+        """Return the table as the feed DataFrame, filling in each column in one step"""
+        columns = self.feed_columns()
+        rows = len(self)
+        product_ids = np.asarray(self.product_ids, dtype=np.int64)
+        values = _object_array(self.values)
+        data = {}
+
+        # Product-level columns are set on each product's first row only
+        data['Handle'] = _object_array(self.handles)[product_ids] if rows else []
+        first_rows = np.flatnonzero(np.diff(product_ids, prepend=-1) != 0)
+        first_products = product_ids[first_rows].tolist()
+        for col in dict.fromkeys(col for product_id in first_products for col in self.product_fields[product_id]):
+            column = np.full(rows, None, dtype=object)
+            column[first_rows] = _object_array([self.product_fields[product_id].get(col) for product_id in first_products])
+            data[col] = column
+
+        # Without sizes the finish is Option1 and Option2 is left empty
+        has_sizes = np.asarray(self.product_has_sizes, dtype=bool)[product_ids]
+        sizes = values[np.asarray(self.size_ids, dtype=np.int64)]
+        finishes = values[np.asarray(self.finish_ids, dtype=np.int64)]
+        data['Option1 Value'] = np.where(has_sizes, sizes, finishes)
+        data['Option2 Value'] = np.where(has_sizes, finishes, None)
+        data['Variant SKU'] = self.skus
+        data['Variant Price'] = self.prices.tolist()
+
+        for col, value in self.constants.items():
+            data[col] = [value] * rows
+        return pd.DataFrame({col: data[col] if col in data else [None] * rows for col in columns}, columns=columns, dtype=object)
+
+def _object_array(items):
+    """Return a list as a 1-D object array, whatever its items are"""
+    array_ = np.empty(len(items), dtype=object)
+    for number, item in enumerate(items):
+        array_[number] = item
+    return array_
@@ -0,0 +1,1180 @@
+"""
+Workbook loading helpers for the Shopify Feed Generator
+Opens the source workbook once and parses every sheet the generator needs from it,
+keeping parsed sheets in an on-disk cache keyed by the workbook's content hash.
+Also reads bounded row windows of a sheet and probes sheet sizes without parsing the rest of it.
+Sheets exported from the ERP as CSV or Parquet files can be loaded in place of the workbook,
+and the workbook can also be passed as bytes, a file-like object or a dict of DataFrames.
+"""
+import datetime as dt
+import hashlib
+import importlib.util
+import io
+import itertools
+import json
+import os
+import posixpath
+import re
+import shutil
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+import openpyxl
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import from_excel
+from pandas.io.parsers import TextParser
+
+# Sheets the generator cannot run without, and sheets it uses when present
+REQUIRED_SHEETS = ['MASTER COPY', 'Sample', 'Finishes']
+OPTIONAL_SHEETS = ['ExampleFeed']
+
+# Configuration for the parsed-sheet cache
+CACHE_CONFIG = {
+    "enabled": True,
+    "cache_dir": ".sheet_cache",          # Created next to where the generator is run
+    "max_bytes": 512 * 1024 * 1024        # Least recently used entries are evicted above this size
+}
+
+# Bump whenever the way sheets are parsed changes so stale cache entries are never reused
+CACHE_FORMAT_VERSION = 4
+
+# Configuration for the workbook reader
+READER_CONFIG = {
+    "backend": "openpyxl"                 # One of READER_BACKENDS
+}
+
+# Columns the generator reads from MASTER COPY and the type each is loaded as
+# (None keeps the type pandas infers). All other columns are skipped when the sheet is read.
+MASTER_COPY_SCHEMA = {
+    'description': None,
+    'size': None,
+    'code': str,
+    'rrp': float,
+    'finish': None,
+    'finish count': None
+}
+
+# Excel row number of the first row under the header; a full parse indexes it as 0
+FIRST_DATA_ROW = 2
+
+# Column K (11th column) holds the product tags; it is read by position and stored under this name
+COLUMN_K = 'column K'
+COLUMN_K_POSITION = 10
+
+def sku_to_string(value):
+    """Convert a SKU cell to a string, without the '.0' pandas adds to whole-number floats"""
+    if pd.isna(value):
+        return np.nan
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def master_copy_columns(header):
+    """Return (position, name) pairs for the MASTER COPY columns the generator uses, given the sheet header.
+
+    Column K is always included: it is read by position, so a blank or missing header cell
+    above it does not matter.
+    """
+    header = list(header)
+    columns = [(header.index(name), name) for name in MASTER_COPY_SCHEMA if name in header]
+    columns.append((COLUMN_K_POSITION, COLUMN_K))
+    return columns
+
+def apply_master_copy_schema(df, column_k=None):
+    """Reduce a MASTER COPY frame to the schema columns, converted to their declared types.
+
+    column_k is the label column K has in df. By default the frame's 11th column is used,
+    unless the frame already has a COLUMN_K column. Without a column K (a sheet narrower
+    than 11 columns) the COLUMN_K column is left empty.
+    """
+    if column_k is None:
+        if COLUMN_K in df.columns:
+            column_k = COLUMN_K
+        elif len(df.columns) > COLUMN_K_POSITION:
+            column_k = df.columns[COLUMN_K_POSITION]
+
+    typed_df = pd.DataFrame(index=df.index)
+    for name, dtype in MASTER_COPY_SCHEMA.items():
+        if name not in df.columns:
+            continue
+        if dtype is str:
+            typed_df[name] = df[name].map(sku_to_string).astype(object)
+        elif dtype is float:
+            typed_df[name] = pd.to_numeric(df[name], errors='coerce').astype(float)
+        else:
+            typed_df[name] = df[name]
+    typed_df[COLUMN_K] = df[column_k] if column_k in df.columns else np.nan
+    return typed_df
+
+def _parse_master_copy(xls):
+    """Parse only the schema columns of MASTER COPY from an open pd.ExcelFile"""
+    # The header row alone ends at its last non-blank cell, so it can be narrower than the sheet
+    header = xls.parse('MASTER COPY', nrows=0).columns.tolist()
+    # pandas names a column without a header 'Unnamed: <position>', so column K can be picked by name
+    column_k = header[COLUMN_K_POSITION] if len(header) > COLUMN_K_POSITION else f"Unnamed: {COLUMN_K_POSITION}"
+    names = {name for _, name in master_copy_columns(header) if name != COLUMN_K} | {column_k}
+    dtype = {'code': str} if 'code' in header else None
+    df = xls.parse('MASTER COPY', usecols=lambda name: name in names, dtype=dtype)
+    return apply_master_copy_schema(df, column_k=column_k)
+
+def hash_workbook(excel_file):
+    """Return the SHA-256 hex digest of the workbook's contents"""
+    digest = hashlib.sha256()
+    with open(excel_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Digests already worked out, keyed by the file's path, size and modification time, so a
+# run that probes, windows and loads the same workbook only hashes it once
+_WORKBOOK_DIGESTS = {}
+
+def workbook_digest(excel_file):
+    """Return the SHA-256 hex digest of a workbook path, bytes or file-like object.
+
+    A path's digest is reused while the file is unchanged on disk; an in-memory workbook is
+    hashed from its data each time.
+    """
+    if isinstance(excel_file, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(excel_file).hexdigest()
+    if isinstance(excel_file, io.BytesIO):
+        # Hash the buffer in place instead of copying it
+        with excel_file.getbuffer() as data:
+            return hashlib.sha256(data).hexdigest()
+    if not isinstance(excel_file, (str, os.PathLike)):
+        position = excel_file.tell()
+        excel_file.seek(0)
+        digest = hashlib.sha256(excel_file.read()).hexdigest()
+        excel_file.seek(position)
+        return digest
+    stat = os.stat(excel_file)
+    key = (os.path.realpath(excel_file), stat.st_size, stat.st_mtime_ns)
+    digest = _WORKBOOK_DIGESTS.get(key)
+    if digest is None:
+        digest = _WORKBOOK_DIGESTS[key] = hash_workbook(excel_file)
+    return digest
+
+def cache_available():
+    """Return whether sheets can be cached; the cache is stored as Parquet, which needs pyarrow"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+def use_sheet_cache(excel_file, use_cache=None):
+    """Return whether a workbook's sheets are read from and stored in the cache.
+
+    Files on disk are cached unless use_cache (by default CACHE_CONFIG["enabled"]) is False.
+    In-memory workbooks are only cached when use_cache is True, as the web app passes for
+    uploads, so by default they never touch the filesystem.
+    """
+    if isinstance(excel_file, (str, os.PathLike)):
+        return CACHE_CONFIG["enabled"] if use_cache is None else use_cache
+    return use_cache is True
+
+def _cache_entry_dir(content_hash):
+    """Directory holding the cached sheets for one workbook, as parsed by the current reader backend"""
+    return os.path.join(CACHE_CONFIG["cache_dir"], f"{content_hash}-{READER_CONFIG['backend']}-v{CACHE_FORMAT_VERSION}")
+
+def _sheet_file_name(sheet_name):
+    """File name used to store a parsed sheet inside a cache entry"""
+    return hashlib.sha1(sheet_name.encode('utf-8')).hexdigest()[:16] + '.parquet'
+
+def _encode_value(value):
+    """Encode a cell value as text that keeps its type, or None for NaN.
+
+    Raises ValueError for a type the cache cannot store exactly.
+    """
+    if value is None:
+        return "n:"
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (bool, np.bool_)):
+        return f"b:{int(value)}"
+    if isinstance(value, (int, np.integer)):
+        return f"i:{int(value)}"
+    if isinstance(value, (float, np.floating)):
+        return f"f:{float(value)!r}"
+    if isinstance(value, str):
+        return f"s:{value}"
+    if isinstance(value, pd.Timestamp):
+        return f"T:{value.isoformat()}"
+    if isinstance(value, dt.datetime):
+        return f"d:{value.isoformat()}"
+    if isinstance(value, dt.time):
+        return f"h:{value.isoformat()}"
+    if isinstance(value, dt.timedelta) and not isinstance(value, pd.Timedelta):
+        return f"t:{value.days},{value.seconds},{value.microseconds}"
+    raise ValueError(f"Cannot cache a value of type {type(value).__name__}")
+
+def _decode_value(text):
+    """Turn text from _encode_value back into the value"""
+    # Empty cells can come back from Parquet as None or NaN
+    if not isinstance(text, str):
+        return np.nan
+    kind, value = text[0], text[2:]
+    if kind == 'n':
+        return None
+    if kind == 's':
+        return value
+    if kind == 'i':
+        return int(value)
+    if kind == 'f':
+        return float(value)
+    if kind == 'b':
+        return value == '1'
+    if kind == 'T':
+        return pd.Timestamp(value)
+    if kind == 'd':
+        return dt.datetime.fromisoformat(value)
+    if kind == 'h':
+        return dt.time.fromisoformat(value)
+    days, seconds, microseconds = map(int, value.split(','))
+    return dt.timedelta(days=days, seconds=seconds, microseconds=microseconds)
+
+def _encode_sheet(df):
+    """Turn a parsed sheet into a frame Parquet stores exactly, and the column metadata to restore it.
+
+    Columns are stored under their positions. Typed columns and text-only columns are stored
+    as they are; any other column is stored as _encode_value text. Raises ValueError if the
+    sheet cannot be stored exactly.
+    """
+    if not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+        raise ValueError("Only sheets indexed from 0 can be cached")
+    stored = {}
+    columns = []
+    for position, col in enumerate(df.columns):
+        values = df.iloc[:, position]
+        if values.dtype != object:
+            kind = 'typed'
+        elif all(isinstance(value, str) or (isinstance(value, float) and np.isnan(value)) for value in values):
+            kind = 'text'
+        else:
+            kind = 'encoded'
+            values = pd.Series([_encode_value(value) for value in values], dtype=object)
+        stored[str(position)] = values
+        columns.append({"label": _encode_value(col), "kind": kind, "dtype": str(df.dtypes.iloc[position])})
+    return pd.DataFrame(stored, index=df.index), columns
+
+def _decode_sheet(stored, columns):
+    """Rebuild a sheet stored by _encode_sheet"""
+    data = {}
+    for position, column in enumerate(columns):
+        values = stored[str(position)]
+        if column["kind"] == 'encoded':
+            values = pd.Series([_decode_value(value) for value in values], dtype=object)
+        elif column["kind"] == 'text':
+            values = values.astype(object).where(values.notna(), np.nan)
+        elif str(values.dtype) != column["dtype"]:
+            values = values.astype(column["dtype"])
+        data[position] = values.reset_index(drop=True)
+    df = pd.DataFrame(data)
+    df.columns = [_decode_value(column["label"]) for column in columns]
+    return df
+
+def _read_cached_sheet(entry_dir, meta, sheet_name):
+    """Read one sheet from a cache entry, or return None if it is not cached or unreadable"""
+    stored = meta.get("sheets", {}).get(sheet_name)
+    if not isinstance(stored, dict):
+        return None
+    try:
+        return _decode_sheet(pd.read_parquet(os.path.join(entry_dir, stored["file"])), stored["columns"])
+    except Exception:
+        return None
+
+def _read_cache_meta(entry_dir):
+    """Read a cache entry's metadata, or return None if the entry is missing or unreadable"""
+    try:
+        with open(os.path.join(entry_dir, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_cache_meta(entry_dir, meta):
+    """Atomically write a cache entry's metadata"""
+    meta_path = os.path.join(entry_dir, 'meta.json')
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+def _entry_size(entry_dir):
+    """Total size in bytes of the files in a cache entry"""
+    total = 0
+    for name in os.listdir(entry_dir):
+        try:
+            total += os.path.getsize(os.path.join(entry_dir, name))
+        except OSError:
+            pass
+    return total
+
+def evict_cache(max_bytes=None):
+    """Remove least recently used cache entries until the cache fits in max_bytes"""
+    cache_dir = CACHE_CONFIG["cache_dir"]
+    max_bytes = CACHE_CONFIG["max_bytes"] if max_bytes is None else max_bytes
+    if not os.path.isdir(cache_dir):
+        return
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, name)
+        if os.path.isdir(entry_dir):
+            meta_path = os.path.join(entry_dir, 'meta.json')
+            last_used = os.path.getmtime(meta_path) if os.path.exists(meta_path) else 0
+            entries.append((last_used, _entry_size(entry_dir), entry_dir))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry_dir in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
+
+def clear_cache():
+    """Delete every cached workbook"""
+    shutil.rmtree(CACHE_CONFIG["cache_dir"], ignore_errors=True)
+
+def _load_cached_sheets(entry_dir, meta, sheet_names, sheets, load_times):
+    """Fill sheets/load_times from a cache entry, returning the sheet names that were not cached"""
+    uncached = []
+    for sheet_name in sheet_names:
+        if sheet_name in meta.get("missing_sheets", []):
+            continue
+        if sheet_name not in meta.get("sheets", {}):
+            uncached.append(sheet_name)
+            continue
+        sheet_start = time.perf_counter()
+        df = _read_cached_sheet(entry_dir, meta, sheet_name)
+        if df is None:
+            uncached.append(sheet_name)
+            continue
+        sheets[sheet_name] = df
+        load_times[f"{sheet_name} (cached)"] = time.perf_counter() - sheet_start
+    return uncached
+
+def _parse_sheets_pandas(excel_file, sheet_names, optional_sheets, sheets, load_times, engine='openpyxl'):
+    """Parse sheets through pd.ExcelFile with the given engine, returning optional sheets that do not exist"""
+    missing_sheets = []
+
+    # pd.ExcelFile opens the zip and parses the shared-strings table once for all sheets
+    open_start = time.perf_counter()
+    with pd.ExcelFile(excel_file, engine=engine) as xls:
+        load_times['(workbook open)'] = time.perf_counter() - open_start
+
+        for sheet_name in sheet_names:
+            if sheet_name not in xls.sheet_names:
+                if sheet_name in optional_sheets:
+                    missing_sheets.append(sheet_name)
+                    continue
+                raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+            sheet_start = time.perf_counter()
+            if sheet_name == 'MASTER COPY':
+                sheets[sheet_name] = _parse_master_copy(xls)
+            else:
+                sheets[sheet_name] = xls.parse(sheet_name)
+            load_times[sheet_name] = time.perf_counter() - sheet_start
+
+    return missing_sheets
+
+def _parse_sheets_openpyxl(excel_file, sheet_names, optional_sheets, sheets, load_times):
+    """Parse sheets with pandas' default openpyxl engine"""
+    return _parse_sheets_pandas(excel_file, sheet_names, optional_sheets, sheets, load_times, engine='openpyxl')
+
+def _parse_sheets_calamine(excel_file, sheet_names, optional_sheets, sheets, load_times):
+    """Parse sheets with pandas' calamine engine (needs the python-calamine package)"""
+    return _parse_sheets_pandas(excel_file, sheet_names, optional_sheets, sheets, load_times, engine='calamine')
+
+def _parse_sheets_xml(excel_file, sheet_names, optional_sheets, sheets, load_times):
+    """Parse sheets by streaming their XML straight out of the xlsx archive, without building cell objects"""
+    missing_sheets = []
+
+    open_start = time.perf_counter()
+    with zipfile.ZipFile(excel_file) as archive:
+        sheet_parts, shared_strings_part, styles_part = _workbook_parts(archive)
+        shared_strings = _read_shared_strings(archive, shared_strings_part)
+        date_styles = _read_date_styles(archive, styles_part)
+        load_times['(workbook open)'] = time.perf_counter() - open_start
+
+        for sheet_name in sheet_names:
+            if sheet_name not in sheet_parts:
+                if sheet_name in optional_sheets:
+                    missing_sheets.append(sheet_name)
+                    continue
+                raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+            sheet_start = time.perf_counter()
+            # MASTER COPY rows are cut down to the schema columns as they are read
+            select_columns = _master_copy_positions if sheet_name == 'MASTER COPY' else None
+            with archive.open(sheet_parts[sheet_name]) as src:
+                rows = _iter_xml_rows(src, shared_strings, date_styles, select_columns)
+                header = next(rows, [])
+                sheets[sheet_name] = _values_to_frame(sheet_name, header, list(rows))
+            load_times[sheet_name] = time.perf_counter() - sheet_start
+
+    return missing_sheets
+
+# Ways of parsing a workbook, selected with READER_CONFIG["backend"] or the --reader CLI option
+READER_BACKENDS = {
+    "openpyxl": _parse_sheets_openpyxl,
+    "calamine": _parse_sheets_calamine,
+    "xml": _parse_sheets_xml
+}
+
+def _parse_sheets(excel_file, sheet_names, optional_sheets, sheets, load_times):
+    """Parse sheets with the configured reader backend, returning optional sheets that do not exist"""
+    backend = READER_CONFIG["backend"]
+    if backend not in READER_BACKENDS:
+        raise ValueError(f"Unknown reader backend '{backend}'. Choose from: {', '.join(READER_BACKENDS)}")
+    return READER_BACKENDS[backend](excel_file, sheet_names, optional_sheets, sheets, load_times)
+
+def _store_in_cache(entry_dir, meta, parsed_sheets, missing_sheets):
+    """Write newly parsed sheets into a cache entry and evict old entries if needed"""
+    os.makedirs(entry_dir, exist_ok=True)
+    for sheet_name, df in parsed_sheets.items():
+        try:
+            stored, columns = _encode_sheet(df)
+        except ValueError as e:
+            # The sheet is parsed again next time rather than cached inexactly
+            print(f"Warning: Not caching sheet '{sheet_name}': {e}")
+            continue
+        file_name = _sheet_file_name(sheet_name)
+        tmp_path = os.path.join(entry_dir, file_name + '.tmp')
+        stored.to_parquet(tmp_path, engine='pyarrow', index=False)
+        os.replace(tmp_path, os.path.join(entry_dir, file_name))
+        meta["sheets"][sheet_name] = {"file": file_name, "columns": columns}
+    meta["missing_sheets"] = sorted(set(meta["missing_sheets"]) | set(missing_sheets))
+    _write_cache_meta(entry_dir, meta)
+    evict_cache()
+
+def _new_cache_meta(excel_file):
+    """Metadata for a cache entry that has nothing stored yet"""
+    source = os.path.basename(excel_file) if isinstance(excel_file, (str, os.PathLike)) else "(in memory)"
+    return {"source": source, "sheets": {}, "missing_sheets": [], "max_rows": {}}
+
+def as_workbook_source(excel_file):
+    """Return an xlsx input in a form the readers accept: bytes are wrapped in a buffer, anything else is unchanged"""
+    if isinstance(excel_file, (bytes, bytearray, memoryview)):
+        return io.BytesIO(excel_file)
+    return excel_file
+
+# File types accepted for sheets exported as tables instead of a workbook
+TABLE_READERS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet'
+}
+
+def is_table_source(source):
+    """Check if an input is a directory or JSON manifest of CSV/Parquet sheets rather than a workbook"""
+    if not isinstance(source, (str, os.PathLike)):
+        return False
+    return os.path.isdir(source) or str(source).lower().endswith('.json')
+
+def is_frame_source(source):
+    """Check if an input is a dict of DataFrames keyed by sheet name rather than a workbook"""
+    return isinstance(source, dict)
+
+def _frame_sheet(frames, sheet_name, first_row=None, last_row=None):
+    """Return one sheet of a dict-of-DataFrames source in the same shape the workbook parse gives.
+
+    first_row and last_row optionally limit it to those data rows (1-based, so row 1 is
+    the row under the header), which are cut out before anything else is done to the frame.
+    """
+    if sheet_name not in frames:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    df = frames[sheet_name]
+    if first_row is not None:
+        df = df.iloc[first_row - 1:last_row]
+    # Empty strings are empty cells, which a workbook read turns into NaN
+    df = _normalise_table_headers(df.replace("", np.nan)).reset_index(drop=True)
+    if sheet_name == 'MASTER COPY':
+        df = apply_master_copy_schema(df)
+    return df
+
+def load_frame_sheets(frames, sheet_names=None, optional_sheets=None):
+    """Load sheets from a dict of DataFrames keyed by sheet name.
+
+    Returns (sheets, load_times) in the same form as load_workbook_sheets, with each
+    frame normalised as if it had been read from the workbook.
+    """
+    sheet_names = list(REQUIRED_SHEETS if sheet_names is None else sheet_names)
+    optional_sheets = list(optional_sheets or [])
+
+    sheets = {}
+    load_times = {}
+    for sheet_name in sheet_names + optional_sheets:
+        if sheet_name not in frames and sheet_name in optional_sheets:
+            continue
+        sheet_start = time.perf_counter()
+        sheets[sheet_name] = _frame_sheet(frames, sheet_name)
+        load_times[sheet_name] = time.perf_counter() - sheet_start
+
+    return sheets, load_times
+
+def _sheet_key(name):
+    """Normalise a sheet or file name so 'MASTER COPY', 'master_copy' and 'Master-Copy' match"""
+    return re.sub(r'[\s_-]+', ' ', str(name)).strip().lower()
+
+def _table_files(source):
+    """Map sheet names to table file paths for a directory or JSON manifest source.
+
+    A directory holds one file per sheet named after it (e.g. 'MASTER COPY.csv' or
+    'master_copy.parquet'). A manifest maps sheet names to file paths relative to itself.
+    """
+    if os.path.isdir(source):
+        files = {}
+        for file_name in sorted(os.listdir(source)):
+            stem, ext = os.path.splitext(file_name)
+            if ext.lower() in TABLE_READERS:
+                files.setdefault(_sheet_key(stem), os.path.join(source, file_name))
+        return files
+
+    with open(source, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if not isinstance(manifest, dict):
+        raise ValueError(f"Manifest {source} must map sheet names to file paths")
+    base_dir = os.path.dirname(os.path.abspath(source))
+    return {_sheet_key(name): os.path.join(base_dir, path) for name, path in manifest.items()}
+
+def _table_path(source, sheet_name):
+    """Return the table file holding a sheet, or raise ValueError if the source has none"""
+    path = _table_files(source).get(_sheet_key(sheet_name))
+    if path is None:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    return path
+
+def _normalise_table_headers(df):
+    """Turn digit-only headers back into integers, as they are when read from the workbook"""
+    return df.rename(columns=lambda col: int(col) if isinstance(col, str) and col.strip().isdigit() else col)
+
+def _read_table(path, sheet_name, first_row=None, last_row=None):
+    """Read one sheet from a CSV or Parquet file into the same shape the workbook parse gives.
+
+    first_row and last_row optionally limit the read to those data rows (1-based, so row 1
+    is the row under the header); CSV rows outside them are skipped without being parsed.
+    """
+    reader = TABLE_READERS.get(os.path.splitext(path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Unsupported file type for sheet '{sheet_name}': {path}")
+
+    if reader == 'csv':
+        # Read SKUs as text so codes keep leading zeros and never pick up a '.0'
+        dtype = {'code': str} if sheet_name == 'MASTER COPY' else None
+        if first_row is None:
+            df = pd.read_csv(path, dtype=dtype)
+        else:
+            df = pd.read_csv(path, dtype=dtype, skiprows=range(1, first_row),
+                             nrows=max(last_row - first_row + 1, 0))
+    else:
+        df = pd.read_parquet(path)
+        if first_row is not None:
+            df = df.iloc[first_row - 1:last_row]
+
+    df = _normalise_table_headers(df)
+    if sheet_name == 'MASTER COPY':
+        df = apply_master_copy_schema(df)
+    return df
+
+def load_table_sheets(source, sheet_names=None, optional_sheets=None):
+    """Load sheets exported as CSV/Parquet files from a directory or JSON manifest.
+
+    Returns (sheets, load_times) in the same form as load_workbook_sheets. The files are
+    fast to read, so they are never cached.
+    """
+    sheet_names = list(REQUIRED_SHEETS if sheet_names is None else sheet_names)
+    optional_sheets = list(optional_sheets or [])
+
+    sheets = {}
+    load_times = {}
+    files = _table_files(source)
+    for sheet_name in sheet_names + optional_sheets:
+        path = files.get(_sheet_key(sheet_name))
+        if path is None:
+            if sheet_name in optional_sheets:
+                continue
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+        sheet_start = time.perf_counter()
+        sheets[sheet_name] = _read_table(path, sheet_name)
+        load_times[sheet_name] = time.perf_counter() - sheet_start
+
+    return sheets, load_times
+
+def load_workbook_sheets(excel_file, sheet_names=None, optional_sheets=None, use_cache=None):
+    """Parse several sheets from a single open of the workbook.
+
+    Returns a tuple of (sheets, load_times) where sheets maps each sheet name to its
+    DataFrame and load_times maps each sheet name to the seconds spent loading it.
+    Optional sheets that are missing from the workbook are simply left out.
+
+    When the cache is used, sheets parsed from an identical workbook before are read from
+    the cache instead, so an unchanged workbook is never parsed twice. excel_file can be a
+    path, the workbook's bytes or a file-like object; see use_sheet_cache for which of them
+    are cached and how use_cache changes that. A directory or JSON manifest of
+    CSV/Parquet files is loaded with load_table_sheets, and a dict of DataFrames with
+    load_frame_sheets.
+    """
+    if is_table_source(excel_file):
+        return load_table_sheets(excel_file, sheet_names, optional_sheets)
+    if is_frame_source(excel_file):
+        return load_frame_sheets(excel_file, sheet_names, optional_sheets)
+    excel_file = as_workbook_source(excel_file)
+
+    sheet_names = list(REQUIRED_SHEETS if sheet_names is None else sheet_names)
+    optional_sheets = list(optional_sheets or [])
+
+    sheets = {}
+    load_times = {}
+    wanted_sheets = sheet_names + optional_sheets
+
+    if not use_sheet_cache(excel_file, use_cache) or not cache_available():
+        _parse_sheets(excel_file, wanted_sheets, optional_sheets, sheets, load_times)
+        return sheets, load_times
+
+    hash_start = time.perf_counter()
+    entry_dir = _cache_entry_dir(workbook_digest(excel_file))
+    load_times['(content hash)'] = time.perf_counter() - hash_start
+
+    meta = _read_cache_meta(entry_dir)
+    if meta is None:
+        meta = _new_cache_meta(excel_file)
+        uncached = wanted_sheets
+    else:
+        uncached = _load_cached_sheets(entry_dir, meta, wanted_sheets, sheets, load_times)
+
+    if uncached:
+        parsed_sheets = {}
+        missing_sheets = _parse_sheets(excel_file, uncached, optional_sheets, parsed_sheets, load_times)
+        sheets.update(parsed_sheets)
+        try:
+            # Record MASTER COPY's row count now, so later --rows checks and previews never
+            # open the workbook; other sheets are probed only if get_sheet_max_row asks
+            max_rows = meta.setdefault("max_rows", {})
+            if 'MASTER COPY' in parsed_sheets and 'MASTER COPY' not in max_rows:
+                max_rows['MASTER COPY'] = probe_sheet_max_row(excel_file, 'MASTER COPY')
+            _store_in_cache(entry_dir, meta, parsed_sheets, missing_sheets)
+        except OSError as e:
+            print(f"Warning: Unable to write sheet cache: {e}")
+    else:
+        # Mark the entry as recently used so eviction keeps it
+        os.utime(os.path.join(entry_dir, 'meta.json'))
+
+    # A required sheet recorded as missing by an earlier optional lookup is still an error
+    for sheet_name in sheet_names:
+        if sheet_name not in sheets:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+    # Return sheets in the order they were asked for
+    sheets = {name: sheets[name] for name in wanted_sheets if name in sheets}
+    return sheets, load_times
+
+def _cached_sheet(excel_file, sheet_name):
+    """Return a sheet from the cache without parsing the workbook, or None if it is not cached"""
+    if not use_sheet_cache(excel_file) or not cache_available():
+        return None
+    entry_dir = _cache_entry_dir(workbook_digest(excel_file))
+    meta = _read_cache_meta(entry_dir)
+    if meta is None:
+        return None
+    return _read_cached_sheet(entry_dir, meta, sheet_name)
+
+def _convert_cell(cell):
+    """Convert an openpyxl cell the same way pandas.read_excel does"""
+    if cell.value is None:
+        return ""
+    if cell.data_type == 'e':
+        return np.nan
+    if cell.data_type == 'n':
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+def read_sheet_window(excel_file, sheet_name, start_row, end_row):
+    """Read only rows start_row..end_row of a sheet, plus its header.
+
+    Row numbers are Excel row numbers, where row 1 is the header and row 2 the first data
+    row, and the returned DataFrame is indexed by them. Uses the cached sheet when the
+    workbook has been parsed before, otherwise streams the sheet XML and stops at end_row
+    instead of parsing the whole sheet.
+    """
+    # The header is always read, so the window starts at the first data row at the earliest
+    first_row = max(start_row, FIRST_DATA_ROW)
+
+    if is_table_source(excel_file) or is_frame_source(excel_file):
+        # Tables and frames count data rows from 1, one below their Excel row number
+        first_data_row, last_data_row = first_row - FIRST_DATA_ROW + 1, end_row - FIRST_DATA_ROW + 1
+        if is_table_source(excel_file):
+            window_df = _read_table(_table_path(excel_file, sheet_name), sheet_name, first_data_row, last_data_row)
+        else:
+            window_df = _frame_sheet(excel_file, sheet_name, first_data_row, last_data_row)
+        window_df.index = range(first_row, first_row + len(window_df))
+        return window_df
+    excel_file = as_workbook_source(excel_file)
+
+    cached_df = _cached_sheet(excel_file, sheet_name)
+    if cached_df is not None:
+        cached_df.index = cached_df.index + FIRST_DATA_ROW
+        return cached_df.loc[first_row:end_row].copy()
+
+    rows = _iter_xml_sheet(excel_file, sheet_name)
+    try:
+        header = next(rows, None)
+        # Rows come back numbered from the first data row, so reading stops once end_row is reached
+        window = list(itertools.islice(rows, first_row - FIRST_DATA_ROW, max(end_row - FIRST_DATA_ROW + 1, 0)))
+    finally:
+        rows.close()
+
+    if not header:
+        return pd.DataFrame()
+    window_df = _values_to_frame(sheet_name, header, window)
+    window_df.index = range(first_row, first_row + len(window_df))
+    return window_df
+
+def _master_copy_positions(header_values):
+    """Positions of the MASTER COPY columns the generator uses, in master_copy_columns order"""
+    return [position for position, _ in master_copy_columns(header_values)]
+
+def _cells_to_frame(sheet_name, header_values, rows):
+    """Build a DataFrame from rows of openpyxl cells the way pandas.read_excel would"""
+    if sheet_name == 'MASTER COPY':
+        # Only convert the cells of the columns the generator uses
+        positions = _master_copy_positions(header_values)
+        data = [[_convert_cell(row[position]) if position < len(row) else "" for position in positions] for row in rows]
+    else:
+        data = [[_convert_cell(cell) for cell in row] for row in rows]
+    return _values_to_frame(sheet_name, header_values, data)
+
+def _values_to_frame(sheet_name, header_values, rows):
+    """Build a DataFrame from rows of converted cell values the way pandas.read_excel would.
+
+    MASTER COPY rows hold only the values at _master_copy_positions(header_values).
+    """
+    if sheet_name == 'MASTER COPY':
+        names = [name for _, name in master_copy_columns(header_values)]
+        dtype = {'code': str} if 'code' in names else None
+        df = TextParser([names] + rows, header=0, skip_blank_lines=False, dtype=dtype).read()
+        return apply_master_copy_schema(df)
+
+    data = [header_values] + rows
+    width = max(len(row) for row in data)
+    data = [row + [""] * (width - len(row)) for row in data]
+    return TextParser(data, header=0, skip_blank_lines=False).read()
+
+def _iter_table_chunks(path, sheet_name, chunk_rows):
+    """Yield a CSV/Parquet sheet in DataFrames of at most chunk_rows rows"""
+    reader = TABLE_READERS.get(os.path.splitext(path)[1].lower())
+    if reader == 'csv':
+        dtype = {'code': str} if sheet_name == 'MASTER COPY' else None
+        chunks = pd.read_csv(path, dtype=dtype, chunksize=chunk_rows)
+    else:
+        try:
+            import pyarrow.parquet as pq
+            chunks = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows))
+        except ImportError:
+            df = pd.read_parquet(path)
+            chunks = (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+
+    first_label = 0
+    for chunk in chunks:
+        chunk = _normalise_table_headers(chunk)
+        if sheet_name == 'MASTER COPY':
+            chunk = apply_master_copy_schema(chunk)
+        chunk.index = range(first_label, first_label + len(chunk))
+        first_label += len(chunk)
+        yield chunk
+
+def _iter_xml_sheet(excel_file, sheet_name):
+    """Stream a sheet's rows from the xlsx archive with _iter_xml_rows, header first.
+
+    MASTER COPY rows are cut down to the schema columns as they are read.
+    """
+    with zipfile.ZipFile(excel_file) as archive:
+        sheet_parts, shared_strings_part, styles_part = _workbook_parts(archive)
+        if sheet_name not in sheet_parts:
+            raise ValueError(f"Worksheet named '{sheet_name}' not found")
+        shared_strings = _read_shared_strings(archive, shared_strings_part)
+        date_styles = _read_date_styles(archive, styles_part)
+
+        select_columns = _master_copy_positions if sheet_name == 'MASTER COPY' else None
+        with archive.open(sheet_parts[sheet_name]) as src:
+            yield from _iter_xml_rows(src, shared_strings, date_styles, select_columns)
+
+def _iter_xml_chunks(excel_file, sheet_name, chunk_rows):
+    """Yield a sheet in DataFrames of at most chunk_rows rows, streaming its XML"""
+    rows = _iter_xml_sheet(excel_file, sheet_name)
+    header = next(rows, None)
+    if header is None:
+        return
+    first_label = 0
+    while True:
+        batch = list(itertools.islice(rows, chunk_rows))
+        if not batch:
+            return
+        chunk = _values_to_frame(sheet_name, header, batch)
+        chunk.index = range(first_label, first_label + len(chunk))
+        first_label += len(chunk)
+        yield chunk
+
+def iter_sheet_chunks(excel_file, sheet_name, chunk_rows=5000):
+    """Yield a sheet as consecutive DataFrames of at most chunk_rows rows.
+
+    Rows are read from the workbook as they are needed, so memory use depends on the
+    chunk size rather than the size of the sheet. The chunks are indexed from 0 like a
+    full parse of the sheet, and MASTER COPY chunks use the MASTER COPY schema.
+    """
+    if is_table_source(excel_file):
+        yield from _iter_table_chunks(_table_path(excel_file, sheet_name), sheet_name, chunk_rows)
+        return
+    if is_frame_source(excel_file):
+        df = _frame_sheet(excel_file, sheet_name)
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+    excel_file = as_workbook_source(excel_file)
+    if READER_CONFIG["backend"] == 'xml':
+        yield from _iter_xml_chunks(excel_file, sheet_name, chunk_rows)
+        return
+
+    # The calamine engine cannot read a sheet in parts, so it streams through openpyxl too
+    wb = openpyxl.load_workbook(excel_file, read_only=True, data_only=True, keep_links=False)
+    try:
+        worksheet = wb[sheet_name]
+        worksheet.reset_dimensions()
+        header = next(worksheet.iter_rows(min_row=1, max_row=1), None)
+        if not header:
+            return
+        header_values = [_convert_cell(cell) for cell in header]
+
+        rows = []
+        blank_rows = []
+        first_label = 0
+        for row in worksheet.iter_rows(min_row=2):
+            # Hold back empty rows until a later row has data, as pandas drops trailing empty rows
+            # (an empty string counts as empty, as it does for pandas)
+            if all(cell.value is None or cell.value == "" for cell in row):
+                blank_rows.append(row)
+                continue
+            rows.extend(blank_rows)
+            blank_rows = []
+            rows.append(row)
+            if len(rows) >= chunk_rows:
+                chunk = _cells_to_frame(sheet_name, header_values, rows)
+                chunk.index = range(first_label, first_label + len(chunk))
+                first_label += len(chunk)
+                rows = []
+                yield chunk
+        if rows:
+            chunk = _cells_to_frame(sheet_name, header_values, rows)
+            chunk.index = range(first_label, first_label + len(chunk))
+            yield chunk
+    finally:
+        wb.close()
+
+# Worksheet XML markers used to find a sheet's size
+_DIMENSION_REF = re.compile(rb'<(?:[\w.-]+:)?dimension\s[^>]*?ref="([^"]+)"')
+_ROW_MARKER = re.compile(rb'<(?:[\w.-]+:)?row[\s>/][^>]*?>')
+_ROW_NUMBER = re.compile(rb'\sr="(\d+)"')
+_CELL_ROW = re.compile(r'[A-Za-z]*(\d+)$')
+
+def _workbook_parts(archive):
+    """Find the sheet, shared-strings and styles parts of an xlsx archive.
+
+    Returns (sheet_parts, shared_strings_part, styles_part), where sheet_parts maps each
+    sheet name to its XML part and the other two are None when the workbook has none.
+    """
+    def local_name(name):
+        return name.rsplit('}', 1)[-1]
+
+    def targets(rels_path):
+        if rels_path not in archive.namelist():
+            return {}
+        rels = ET.fromstring(archive.read(rels_path))
+        return {el.get('Id'): (el.get('Type', ''), el.get('Target', '')) for el in rels if local_name(el.tag) == 'Relationship'}
+
+    def resolve(base_dir, target):
+        return target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(base_dir, target))
+
+    workbook_path = next((resolve('', target) for rel_type, target in targets('_rels/.rels').values()
+                          if rel_type.endswith('/officeDocument')), 'xl/workbook.xml')
+    workbook_dir, workbook_file = posixpath.split(workbook_path)
+    workbook_targets = targets(posixpath.join(workbook_dir, '_rels', workbook_file + '.rels'))
+
+    def part_of_type(suffix):
+        return next((resolve(workbook_dir, target) for rel_type, target in workbook_targets.values()
+                     if rel_type.endswith(suffix)), None)
+
+    sheet_parts = {}
+    for el in ET.fromstring(archive.read(workbook_path)).iter():
+        if local_name(el.tag) == 'sheet':
+            rel_id = next(value for key, value in el.attrib.items() if local_name(key) == 'id')
+            sheet_parts[el.get('name')] = resolve(workbook_dir, workbook_targets[rel_id][1])
+    return sheet_parts, part_of_type('/sharedStrings'), part_of_type('/styles')
+
+def get_sheet_names(excel_file):
+    """List a workbook's sheet names without parsing any sheet"""
+    if is_table_source(excel_file):
+        # Report known sheets under their workbook names, whatever their files are called
+        known_sheets = {_sheet_key(name): name for name in REQUIRED_SHEETS + OPTIONAL_SHEETS}
+        return [known_sheets.get(key, key) for key in _table_files(excel_file)]
+    if is_frame_source(excel_file):
+        return list(excel_file)
+    with zipfile.ZipFile(as_workbook_source(excel_file)) as archive:
+        return list(_workbook_parts(archive)[0])
+
+def _worksheet_part(archive, sheet_name):
+    """Find the path of a sheet's XML part inside an xlsx archive"""
+    sheet_parts = _workbook_parts(archive)[0]
+    if sheet_name not in sheet_parts:
+        raise ValueError(f"Worksheet named '{sheet_name}' not found")
+    return sheet_parts[sheet_name]
+
+def _local_name(tag):
+    """Tag name without its XML namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+def _string_item_text(item):
+    """Text of a shared-string or inline-string item, joining rich-text runs and skipping phonetic hints"""
+    texts = []
+    for child in item:
+        name = _local_name(child.tag)
+        if name == 't':
+            texts.append(child.text or '')
+        elif name == 'r':
+            texts.extend(t.text or '' for t in child if _local_name(t.tag) == 't')
+    return ''.join(texts)
+
+def _read_shared_strings(archive, part):
+    """Read the workbook's shared-strings table"""
+    if part is None:
+        return []
+    shared_strings = []
+    with archive.open(part) as src:
+        for _, el in ET.iterparse(src):
+            if _local_name(el.tag) == 'si':
+                shared_strings.append(_string_item_text(el))
+                el.clear()
+    return shared_strings
+
+def _read_date_styles(archive, part):
+    """Map the index of every cell style with a date or duration number format to 'date' or 'timedelta'"""
+    if part is None:
+        return {}
+    styles = ET.fromstring(archive.read(part))
+    formats = dict(BUILTIN_FORMATS)
+    cell_formats = []
+    for el in styles:
+        if _local_name(el.tag) == 'numFmts':
+            formats.update((int(fmt.get('numFmtId')), fmt.get('formatCode', '')) for fmt in el)
+        elif _local_name(el.tag) == 'cellXfs':
+            cell_formats = [int(xf.get('numFmtId', 0)) for xf in el if _local_name(xf.tag) == 'xf']
+
+    date_styles = {}
+    for index, format_id in enumerate(cell_formats):
+        format_code = formats.get(format_id)
+        if format_code and is_timedelta_format(format_code):
+            date_styles[index] = 'timedelta'
+        elif format_code and is_date_format(format_code):
+            date_styles[index] = 'date'
+    return date_styles
+
+def _xml_cell_value(cell_type, style, value, shared_strings, date_styles):
+    """Convert a cell's raw XML value the same way openpyxl and pandas' _convert_cell would"""
+    if value is None:
+        return ""
+    if cell_type == 's':
+        return shared_strings[int(value)]
+    if cell_type in ('inlineStr', 'str'):
+        return value
+    if cell_type == 'b':
+        return bool(int(value))
+    if cell_type == 'e':
+        return np.nan
+    if cell_type == 'd':
+        return dt.datetime.fromisoformat(value)
+
+    number = float(value) if any(ch in value for ch in '.eE') else int(value)
+    date_style = date_styles.get(int(style)) if style else None
+    if date_style is not None:
+        return from_excel(number, timedelta=(date_style == 'timedelta'))
+    # pandas keeps whole numbers as int
+    return int(number) if int(number) == number else float(number)
+
+def _column_index(ref):
+    """0-based column index of a cell reference like 'K12'"""
+    index = 0
+    for ch in ref:
+        if ch > '9':
+            index = index * 26 + ord(ch.upper()) - 64
+        else:
+            break
+    return index - 1
+
+def _iter_xml_rows(src, shared_strings, date_styles, select_columns=None):
+    """Stream a sheet's rows from its XML as lists of converted values, the way pandas reads them.
+
+    The header row is yielded in full. If select_columns is given, it is called with the
+    header and every later row is cut down to the positions it returns, without converting
+    the other cells. Missing rows come back as empty rows and trailing empty rows are
+    dropped, as pandas does.
+    """
+    tags = None
+    header_read = False
+    positions = None
+    selected = None
+    blank_rows = 0
+    expected_row = 1
+    for _, el in ET.iterparse(src):
+        if tags is None:
+            # Compare full tag names rather than stripping the namespace from every element
+            namespace = el.tag[:el.tag.index('}') + 1] if el.tag.startswith('{') else ''
+            tags = tuple(namespace + name for name in ('row', 'c', 'v', 'is'))
+            row_tag, cell_tag, value_tag, inline_tag = tags
+        if el.tag != row_tag:
+            continue
+
+        row_number = int(el.get('r', expected_row))
+        cells = {}
+        has_data = False
+        column = 0
+        for cell in el:
+            if cell.tag != cell_tag:
+                continue
+            ref = cell.get('r')
+            if ref:
+                column = _column_index(ref)
+            cell_type = cell.get('t', 'n')
+            value = None
+            for child in cell:
+                if child.tag == value_tag:
+                    value = child.text
+                elif child.tag == inline_tag:
+                    value = _string_item_text(child)
+
+            if selected is not None and column not in selected:
+                # Only whether the cell holds anything matters for columns that are not kept
+                if value is not None and not (cell_type == 's' and shared_strings[int(value)] == "") and value != "":
+                    has_data = True
+            else:
+                converted = _xml_cell_value(cell_type, cell.get('s'), value, shared_strings, date_styles)
+                if not (isinstance(converted, str) and converted == ""):
+                    cells[column] = converted
+                    has_data = True
+            column += 1
+        # Drop the parsed cells so memory does not grow with the sheet
+        el.clear()
+
+        # Rows missing from the XML are empty rows
+        missing_rows = row_number - expected_row
+        expected_row = row_number + 1
+
+        if not header_read:
+            # The sheet's first row is the header, even if it is empty
+            width = max(cells) + 1 if cells and missing_rows == 0 else 0
+            header = [cells.get(position, "") for position in range(width)]
+            yield header
+            header_read = True
+            if select_columns is not None:
+                positions = select_columns(header)
+                selected = set(positions)
+            if missing_rows == 0:
+                continue
+            missing_rows -= 1
+
+        blank_rows += missing_rows
+        if not has_data:
+            blank_rows += 1
+            continue
+        # Empty rows only count once a later row has data, as pandas drops trailing empty rows
+        for _ in range(blank_rows):
+            yield [] if positions is None else [""] * len(positions)
+        blank_rows = 0
+        if positions is None:
+            yield [cells.get(position, "") for position in range(max(cells) + 1)]
+        else:
+            yield [cells.get(position, "") for position in positions]
+
+def probe_sheet_max_row(excel_file, sheet_name):
+    """Return a sheet's last row number without building any cells.
+
+    Reads the dimension the sheet declares (the same value openpyxl reports as max_row).
+    If the sheet declares no usable dimension, scans the row markers in the sheet XML instead.
+    """
+    with zipfile.ZipFile(as_workbook_source(excel_file)) as archive:
+        with archive.open(_worksheet_part(archive, sheet_name)) as src:
+            head = src.read(64 * 1024)
+            dimension = _DIMENSION_REF.search(head)
+            if dimension:
+                last_cell = dimension.group(1).decode('ascii').split(':')[-1]
+                match = _CELL_ROW.match(last_cell)
+                # A single-cell "A1" dimension is what some writers emit for unknown sizes
+                if match and ':' in dimension.group(1).decode('ascii'):
+                    return int(match.group(1))
+
+            # Fall back to the last row marker in the sheet data
+            max_row = 0
+            row_count = 0
+            buffer = head
+            while True:
+                chunk = src.read(1024 * 1024)
+                # Only scan complete tags; keep the tail for the next chunk
+                cut = buffer.rfind(b'<') if chunk else len(buffer)
+                for marker in _ROW_MARKER.finditer(buffer, 0, cut):
+                    row_count += 1
+                    number = _ROW_NUMBER.search(marker.group(0))
+                    max_row = int(number.group(1)) if number else row_count
+                if not chunk:
+                    return max_row
+                buffer = buffer[cut:] + chunk
+
+def table_max_row(source, sheet_name):
+    """Return the last row number a sheet exported as CSV/Parquet would have in the workbook"""
+    path = _table_path(source, sheet_name)
+    if TABLE_READERS.get(os.path.splitext(path)[1].lower()) == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+            # The row count is in the file footer, so no data is read
+            row_count = pq.ParquetFile(path).metadata.num_rows
+        except ImportError:
+            row_count = len(pd.read_parquet(path))
+    else:
+        # Only the first column is parsed; quoted fields can span lines, so lines are not just counted
+        row_count = len(pd.read_csv(path, usecols=[0]))
+    # Add one for the header row
+    return row_count + 1
+
+def get_sheet_max_row(excel_file, sheet_name, use_cache=None):
+    """Return a sheet's last row number, using the value stored in the cache when available.
+
+    use_cache works as in load_workbook_sheets.
+    """
+    if is_table_source(excel_file):
+        return table_max_row(excel_file, sheet_name)
+    if is_frame_source(excel_file):
+        # Add one for the header row
+        return len(_frame_sheet(excel_file, sheet_name)) + 1
+    excel_file = as_workbook_source(excel_file)
+
+    if not use_sheet_cache(excel_file, use_cache):
+        return probe_sheet_max_row(excel_file, sheet_name)
+
+    entry_dir = _cache_entry_dir(workbook_digest(excel_file))
+    meta = _read_cache_meta(entry_dir)
+    if meta is not None and sheet_name in meta.get("max_rows", {}):
+        return meta["max_rows"][sheet_name]
+
+    max_row = probe_sheet_max_row(excel_file, sheet_name)
+    try:
+        os.makedirs(entry_dir, exist_ok=True)
+        meta = meta or _new_cache_meta(excel_file)
+        meta.setdefault("max_rows", {})[sheet_name] = max_row
+        _write_cache_meta(entry_dir, meta)
+    except OSError as e:
+        print(f"Warning: Unable to write sheet cache: {e}")
+    return max_row
+
+def print_load_times(load_times):
+    """Print how long each sheet took to load"""
+    print("Sheet load times:")
+    for sheet_name, seconds in load_times.items():
+        print(f"  {sheet_name}: {seconds:.3f}s")
+    print(f"  Total: {sum(load_times.values()):.3f}s")